@@ -5,23 +5,32 @@
 
 import os
 import sys
+import asyncio
 import argparse
+import atexit
+import importlib.util
 import logging
 import random
-from typing import List, Dict, Optional
+import re
+import threading
+from concurrent.futures import Future
+import httpx
+from typing import List, Dict, Optional, TYPE_CHECKING
 
 # --- Import classes from the other scripts ---
 # Ensure the other scripts are in the same directory or Python's path
+# story_generator is imported lazily in the story step, so --help and idea-only runs skip loading it
 try:
     from idea_generator import PromptSettingGenerator, DEFAULT_PROPOSALS_FOLDER, STORY_GENERATOR_SCRIPT_NAME
-    from story_generator import ShortStoryGenerator, MODELL_NAME as STORY_MODELL_NAME # Use specific model name if needed
 except ImportError as e:
     print(f"Error: Could not import necessary classes. Make sure 'idea_generator.py' and 'story_generator.py' are in the same directory or accessible via PYTHONPATH.")
     print(f"Details: {e}")
     sys.exit(1)
 
-# Logging configuration for the main app
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+if TYPE_CHECKING:
+    from story_generator import StoryGenerator
+
+# Logger for the main app (configured once in main())
 logger = logging.getLogger("MainApp")
 
 # --- Language Mapping ---
@@ -31,6 +40,13 @@ LANG_CODE_TO_FULL = {
     "en": "Englisch"
 }
 
+# Cheap plausibility check for API keys (token characters only, reasonable length)
+API_KEY_PATTERN = re.compile(r"^[A-Za-z0-9._-]{20,}$")
+
+# httpx only speaks HTTP/2 with the optional 'h2' package (pip install "httpx[http2]")
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+KEEPALIVE_EXPIRY_SECONDS = 120.0 # Idle time before a pooled API connection is closed
+
 def display_proposals(proposals: List[Dict], lang_conf: Dict) -> None:
     """Displays the generated proposals to the user."""
     print("\n" + "=" * 30 + " Generated Story Ideas " + "=" * 30)
@@ -47,8 +63,8 @@ def display_proposals(proposals: List[Dict], lang_conf: Dict) -> None:
 
         # Use labels from the loaded language config
         print(lang_conf["INFO_PROPOSAL_SUMMARY"].format(idx=i, titel=title, genre=genre, wortanzahl=wordcount))
-        prompt_summary = prompt_text[:150] + "..." if len(prompt_text) > 150 else prompt_text
-        setting_summary = setting_text[:100] + "..." if len(setting_text) > 100 else setting_text
+        prompt_summary = f"{prompt_text[:150]}..." if len(prompt_text) > 150 else prompt_text
+        setting_summary = f"{setting_text[:100]}..." if len(setting_text) > 100 else setting_text
         print(f"  {lang_conf['LABEL_PROMPT']}: {prompt_summary}")
         print(f"  {lang_conf['LABEL_SETTING']}: {setting_summary}")
         print("-" * 25)
@@ -71,7 +87,7 @@ def select_proposal(proposals: List[Dict], lang_conf: Dict) -> Optional[Dict]:
                 logger.info("User quit selection.")
                 return None
             elif choice == 'r':
-                selected_index = random.randint(0, max_idx - 1)
+                selected_index = random.randrange(max_idx)
                 logger.info(f"Randomly selected proposal: {selected_index + 1}")
                 return proposals[selected_index]
             else:
@@ -88,77 +104,132 @@ def select_proposal(proposals: List[Dict], lang_conf: Dict) -> Optional[Dict]:
             return None
 
 
-def run_story_generation(proposal: Dict, language_code: str, api_key: Optional[str], output_dir: str, debug: bool) -> None:
+def _story_generation_args(proposal: Dict, story_language_full: str) -> Dict:
+    """Builds the keyword arguments for StoryGenerator.generate()/generate_to_file() from a proposal."""
+    from story_generator import DEFAULT_TARGET_WORDS, MAX_WORDS_PER_CHAPTER
+
+    # Extract details from the proposal (use .get for safety)
+    # Use 'wortanzahl' key from the proposal
+    return dict(
+        prompt=str(proposal.get('prompt', '')),
+        setting=str(proposal.get('setting', '')),
+        titel=str(proposal.get('titel', 'Untitled Story')),
+        word_count=int(proposal.get('wortanzahl', DEFAULT_TARGET_WORDS)),
+        sprache=story_language_full,
+        additional_instructions=None, # Add option for this later if needed
+        chapter_mode=True, # Default to chapter mode for potentially long stories
+        max_words_per_chapter=MAX_WORDS_PER_CHAPTER
+        # Pass debug status indirectly via logging level setup if needed,
+        # or add a debug param to generate if it influences internal logic beyond logging.
+    )
+
+
+def _generate_story_text(story_gen: "StoryGenerator", proposal: Dict, story_language_full: str) -> Optional[str]:
+    """Runs the story generator for a proposal and returns the story text (None on failure)."""
+    # Note: We are calling the generate method directly, not using subprocess
+    return story_gen.generate(**_story_generation_args(proposal, story_language_full))
+
+
+def start_speculative_generation(proposal: Dict, story_language_full: str, api_key: Optional[str],
+                                 use_cache: bool = False,
+                                 http_client: Optional[httpx.Client] = None) -> Future:
     """
-    Initializes and runs the ShortStoryGenerator with the selected proposal.
+    Starts generating the story for `proposal` in the background while the user is still choosing.
+    The future resolves to a tuple (story_gen, generated_story).
+    Runs in a daemon thread, so quitting at the selection prompt does not wait for the story.
     """
-    logger.info(f"Preparing to generate story for: '{proposal.get('titel', '[N/A]')}'")
+    future: Future = Future()
 
-    # Map the language code ('de'/'en') to the full name expected by story_generator
-    story_language_full = LANG_CODE_TO_FULL.get(language_code)
-    if not story_language_full:
-        logger.error(f"Internal Error: Cannot map language code '{language_code}' to a full name.")
-        return # Cannot proceed without a valid language name
+    def generate_in_background():
+        if not future.set_running_or_notify_cancel():
+            return # Cancelled before it started
+        try:
+            from story_generator import StoryGenerator, MODELL_NAME as STORY_MODELL_NAME # Use specific model name if needed
+            story_gen = StoryGenerator(api_key=api_key, model=STORY_MODELL_NAME, use_cache=use_cache,
+                                       http_client=http_client)
+            future.set_result((story_gen, _generate_story_text(story_gen, proposal, story_language_full)))
+        except BaseException as e:
+            future.set_exception(e)
 
-    try:
-        # Initialize the story generator
-        # Pass API key and potentially model name if different defaults are desired
-        story_gen = ShortStoryGenerator(api_key=api_key, model=STORY_MODELL_NAME)
-        lang_conf_story = story_gen._get_lang_config(story_language_full) # Get config for logging
+    logger.info(f"Speculatively generating story for: '{proposal.get('titel', '[N/A]')}'")
+    threading.Thread(target=generate_in_background, name="speculative-story", daemon=True).start()
+    return future
+
+
+def run_story_generation(proposal: Dict, story_language_full: str, api_key: Optional[str], output_dir: str, debug: bool,
+                         speculative_future: Optional[Future] = None, use_cache: bool = False,
+                         http_client: Optional[httpx.Client] = None) -> None:
+    """
+    Initializes and runs the StoryGenerator with the selected proposal.
+    `story_language_full` is the language name expected by story_generator ('Deutsch'/'Englisch').
+    If `speculative_future` is given, it must belong to this proposal; its result is used
+    instead of starting a new generation.
+    """
+    logger.info(f"Preparing to generate story for: '{proposal.get('titel', '[N/A]')}'")
 
-        # Extract details from the proposal (use .get for safety)
+    try:
+        from story_generator import StoryGenerator, MODELL_NAME as STORY_MODELL_NAME, DEFAULT_TARGET_WORDS
         title = str(proposal.get('titel', 'Untitled Story'))
-        prompt = str(proposal.get('prompt', ''))
-        setting = str(proposal.get('setting', ''))
-        # Use 'wortanzahl' key from the proposal
-        wordcount = int(proposal.get('wortanzahl', ShortStoryGenerator.DEFAULT_TARGET_WORDS))
-
-        # --- Call the story generator method ---
-        logger.info(lang_conf_story["INFO_GENERATING_STORY"].format(
-            titel=title, wortanzahl=wordcount, sprache=story_language_full
-        ))
+        saved_story_path = None
 
-        # Note: We are calling the generate_story method directly, not using subprocess
-        generated_story = story_gen.generate_story(
-            prompt=prompt,
-            setting=setting,
-            title=title,
-            word_count=wordcount,
-            language=story_language_full,
-            additional_instructions=None, # Add option for this later if needed
-            chapter_mode=True, # Default to chapter mode for potentially long stories
-            max_words_per_chapter=ShortStoryGenerator.MAX_WORDS_PER_CHAPTER
-            # Pass debug status indirectly via logging level setup if needed,
-            # or add a debug param to generate_story if it influences internal logic beyond logging.
-        )
+        if speculative_future is not None:
+            # The story was started in the background while the user was selecting
+            logger.info("Using speculatively started story generation (waiting for it to finish)...")
+            story_gen, generated_story = speculative_future.result()
+            lang_conf_story = story_gen._get_lang_config(story_language_full) # Get config for logging
+        else:
+            # Initialize the story generator
+            # Pass API key and potentially model name if different defaults are desired
+            story_gen = StoryGenerator(api_key=api_key, model=STORY_MODELL_NAME, use_cache=use_cache,
+                                       http_client=http_client)
+            lang_conf_story = story_gen._get_lang_config(story_language_full) # Get config for logging
+
+            # --- Call the story generator method ---
+            logger.info(lang_conf_story["INFO_GENERATING_STORY"].format(
+                titel=title, wortanzahl=proposal.get('wortanzahl', DEFAULT_TARGET_WORDS), sprache=story_language_full
+            ))
+            try:
+                # Chapters are written to the output file as soon as they are finished
+                generated_story, saved_story_path = story_gen.generate_to_file(
+                    **_story_generation_args(proposal, story_language_full), output_path=output_dir
+                )
+            except OSError as open_err:
+                logger.error(f"Could not create the story file, generating without streaming to disk: {open_err}")
+                generated_story = _generate_story_text(story_gen, proposal, story_language_full)
 
         if generated_story:
-            actual_word_count = len(generated_story.split())
+            actual_word_count = story_gen.last_word_count # Already counted by the generator
             logger.info(lang_conf_story["INFO_FINAL_WORD_COUNT"].format(wortanzahl=actual_word_count))
 
-            # Save the story
-            try:
-                saved_story_path = story_gen.save_as_text_file(
-                    content=generated_story,
-                    title=title,
-                    language=story_language_full,
-                    output_path=output_dir # Save in the specified output directory
-                )
+            if saved_story_path:
+                # Already streamed to disk by generate_to_file
                 logger.info(f"Story successfully generated and saved to: {saved_story_path}")
-                # Optionally print the story content as well
-                # print("\n--- Generated Story ---")
-                # print(generated_story)
-                # print("--- End Story ---")
-
-            except Exception as save_err:
-                logger.error(f"Failed to save the generated story: {save_err}")
-                # Print story to console as fallback if saving failed
-                print("\n--- Generated Story (Save Failed) ---")
-                print(generated_story)
-                print("--- End Story ---")
+            else:
+                # Save the story
+                try:
+                    saved_story_path = story_gen.save_as_text_file(
+                        content=generated_story,
+                        title=title,
+                        language=story_language_full,
+                        output_path=output_dir # Save in the specified output directory
+                    )
+                    logger.info(f"Story successfully generated and saved to: {saved_story_path}")
+                    # Optionally print the story content as well
+                    # print("\n--- Generated Story ---")
+                    # print(generated_story)
+                    # print("--- End Story ---")
+
+                except Exception as save_err:
+                    logger.error(f"Failed to save the generated story: {save_err}")
+                    # Print story to console as fallback if saving failed
+                    print("\n--- Generated Story (Save Failed) ---")
+                    print(generated_story)
+                    print("--- End Story ---")
         else:
             logger.error(lang_conf_story["ERROR_GENERATION_FAILED"])
 
+    except ImportError as e:
+        logger.error(f"Could not import 'story_generator.py'. Make sure it is in the same directory or accessible via PYTHONPATH. Details: {e}")
     except ValueError as ve:
         # Catch config errors from story generator init (e.g., language)
         logger.error(f"Story Generator Configuration Error: {ve}")
@@ -192,17 +263,17 @@ def main():
                         help="Nebius API key (reads NEBIUS_API_KEY env var if not set)")
     parser.add_argument("--output-dir", type=str, default="generated_stories",
                         help="Directory for saving the final generated story text file")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="Reuse cached ideas/stories for identical requests instead of calling the API again")
+    parser.add_argument("--speculate", action="store_true",
+                        help="Start writing the first proposal's story in the background while you choose (extra API cost if another idea is selected)")
     parser.add_argument("--debug", action="store_true", help="Enable detailed debug logging for all steps")
 
     args = parser.parse_args()
 
     # --- Configure Logging Level ---
     log_level = logging.DEBUG if args.debug else logging.INFO
-    # Apply level to the main app logger and potentially imported module loggers if needed
-    logger.setLevel(log_level)
-    logging.getLogger("IdeaGenerator").setLevel(log_level) # Set level for idea_generator logs
-    logging.getLogger("ShortStoryGenerator").setLevel(log_level) # Set level for story_generator logs
-    # Reconfigure root logger if necessary (can affect library logs)
+    # Configure the root logger only; module loggers stay at NOTSET and inherit its level
     logging.basicConfig(level=log_level, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', force=True)
     logger.debug("Debug mode enabled for MainApp.")
 
@@ -210,15 +281,34 @@ def main():
     if not args.api_key:
         logger.error("API Key is required. Please provide --api-key or set the NEBIUS_API_KEY environment variable.")
         sys.exit(1)
+    if not API_KEY_PATTERN.match(args.api_key):
+        # Fail before any API client is created or any paid request is made
+        logger.error("API Key looks malformed (expected at least 20 characters of A-Z, a-z, 0-9, '.', '_' or '-'). "
+                     "Please check --api-key or the NEBIUS_API_KEY environment variable.")
+        sys.exit(1)
+
+    # Map the language code ('de'/'en') to the full name expected by story_generator
+    # (argparse choices guarantee a valid code)
+    story_language_full = LANG_CODE_TO_FULL[args.language_code]
 
     # --- Step 1: Generate Story Ideas ---
     logger.info("--- Step 1: Generating Story Ideas ---")
     idea_gen = None
     selected_proposal = None
+    speculative_future: Optional[Future] = None
+    # One connection pool for idea and story generation (TLS handshake and DNS lookup are paid once).
+    # HTTP/2 multiplexes the parallel requests over one connection if the optional 'h2' package is installed.
+    # Idle connections are kept for 2 minutes (httpx default: 5 s) so they survive the interactive idea selection.
+    http_client = httpx.Client(http2=HTTP2_AVAILABLE,
+                               limits=httpx.Limits(max_keepalive_connections=16, max_connections=32,
+                                                   keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS))
+    atexit.register(http_client.close) # Also closed on the sys.exit() paths
     try:
         idea_gen = PromptSettingGenerator(
             api_key=args.api_key,
-            proposals_folder=args.proposals_folder
+            proposals_folder=args.proposals_folder,
+            use_cache=args.use_cache,
+            http_client=http_client
             # Add model override if needed: model=args.idea_model
         )
         # Get language config for UI messages during idea generation/selection
@@ -228,18 +318,19 @@ def main():
         default_genres = ["Sherlock Holmes", "Science Fiction", "Fantasy", "Horror", "Mystery", "Dark Fantasy", "Cyberpunk"]
         if not args.genres:
             args.genres = default_genres
-        selected_genres = args.genres
         if len(args.genres) > 3:
             k = random.randint(1, 3)
             selected_genres = random.sample(args.genres, k=k)
+        else:
+            selected_genres = args.genres # Common case: no sampling needed
         logger.info(f"Using genres for idea generation: {', '.join(selected_genres)}")
 
-        # Generate proposals
-        proposals = idea_gen.generate_proposals(
+        # Generate proposals (split into concurrent API requests for larger counts)
+        proposals = asyncio.run(idea_gen.generate_proposals_async(
             genres=selected_genres,
             count=args.proposal_count,
             language_code=args.language_code
-        )
+        ))
 
         if not proposals:
             logger.error("Failed to generate any story ideas. Exiting.")
@@ -248,22 +339,24 @@ def main():
         # Optionally auto-save ideas
         if args.auto_save_ideas:
             logger.info(f"Auto-saving generated ideas to: {args.proposals_folder}")
-            required_keys_for_saving = ["titel", "prompt", "setting", "genre", "wortanzahl"]
-            for i, prop in enumerate(proposals, 1):
-                missing_keys = [k for k in required_keys_for_saving if k not in prop or not prop[k]]
-                if missing_keys:
-                    logger.warning(lang_conf_idea["WARN_INCOMPLETE_PROPOSAL"].format(idx=i, missing=', '.join(missing_keys)))
-                    continue
-                try:
-                    idea_gen.save_proposal_as_txt(prop, args.language_code, use_proposals_folder=True)
-                except Exception as e:
-                    logger.error(lang_conf_idea["ERROR_SAVING_PROPOSAL"].format(idx=i, error=e))
+            idea_gen.save_proposals_as_txt(proposals, args.language_code, use_proposals_folder=True)
 
 
         # --- Step 2: Display and Select Idea ---
         logger.info("--- Step 2: Select a Story Idea ---")
         display_proposals(proposals, lang_conf_idea)
+        if args.speculate:
+            # Use the time the user needs to choose: start the first proposal's story right away
+            speculative_future = start_speculative_generation(
+                proposals[0], story_language_full, args.api_key, use_cache=args.use_cache, http_client=http_client
+            )
+        # input() only blocks the main thread; the speculative story keeps generating meanwhile
         selected_proposal = select_proposal(proposals, lang_conf_idea)
+        if speculative_future is not None and selected_proposal is not proposals[0]:
+            # Wrong guess: discard the speculative result (a running request cannot be aborted)
+            logger.info("Selected proposal differs from the speculated one. Discarding speculative story.")
+            speculative_future.cancel()
+            speculative_future = None
 
     except ValueError as ve:
         logger.error(f"Configuration Error during idea generation: {ve}")
@@ -289,10 +382,13 @@ def main():
 
         run_story_generation(
             proposal=selected_proposal,
-            language_code=args.language_code, # Use the same language code
+            story_language_full=story_language_full, # Same language as the ideas
             api_key=args.api_key,
             output_dir=args.output_dir,
-            debug=args.debug
+            debug=args.debug,
+            speculative_future=speculative_future,
+            use_cache=args.use_cache,
+            http_client=http_client
         )
     else:
         logger.info("No proposal selected or user quit. Story generation skipped.")
@@ -5,20 +5,31 @@
 
 import os
 import sys
+import asyncio
 import random
 import argparse
 import json
-import datetime
-import subprocess
+import functools
+import hashlib
+import itertools
 import re
+import shlex
+import stat
 # import glob # Not currently used, can be removed if not needed later
 import logging
 import time
 import tempfile # Use tempfile for secure temporary file handling
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Optional, Any, Tuple
-from openai import OpenAI
+import httpx # Installed with openai; used for an optional shared HTTP client
+from openai import OpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
 from dotenv import load_dotenv
 
+try:
+    import orjson # Optional: faster JSON (de)serialization, falls back to the json module
+except ImportError:
+    orjson = None
+
 load_dotenv()
 
 # === Configuration and Constants ===
@@ -28,14 +39,63 @@ DEFAULT_PROPOSALS_FOLDER = "proposals" # Default folder for auto-saved proposals
 DEFAULT_TARGET_WORDS_MIN = 5000       # Default minimum word count for generated ideas
 DEFAULT_TARGET_WORDS_MAX = 10000      # Default maximum word count for generated ideas
 STORY_GENERATOR_SCRIPT_NAME = "story_generator.py" # Name of the story generator script
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "story-gen") # On-disk response cache (--use-cache)
+MAX_CACHED_PROPOSALS: int = 100 # Max proposals kept in the cache pool per genre set and language
+# Keys every proposal needs (German keys, as produced by the prompts and the repair function)
+REQUIRED_PROPOSAL_KEYS: Tuple[str, ...] = ("titel", "prompt", "setting", "genre", "wortanzahl") # Tuple: fixed order in messages
+# Short JSON keys requested from the model (fewer output tokens) -> internal proposal keys
+SHORT_PROPOSAL_KEYS: Dict[str, str] = {"t": "titel", "p": "prompt", "s": "setting", "g": "genre", "w": "wortanzahl"}
+
+# Precompiled patterns for _safe_filename
+_RE_UNSAFE_FILENAME_CHARS = re.compile(r'[^\w\s-]')
+_RE_WHITESPACE = re.compile(r'\s+')
+# Characters that require quoting an argument in the Windows cmd example command
+_RE_CMD_NEEDS_QUOTES = re.compile(r'[\s"&|<>^%()]')
 
 # Retry Constants
 DEFAULT_RETRY_DELAY_S: int = 10
 MAX_RETRIES: int = 3
 RETRY_BACKOFF_FACTOR: float = 1.5
+MAX_RETRY_AFTER_S: float = 120.0 # Upper bound for a server-provided Retry-After delay
+# Backoff delay before retry n (index n-1), precomputed from the constants above
+_RETRY_DELAYS = tuple(DEFAULT_RETRY_DELAY_S * (RETRY_BACKOFF_FACTOR ** i) for i in range(MAX_RETRIES))
+# Temporary server-side errors worth retrying (429, 5xx incl. "overloaded", timeouts, connection drops)
+RETRYABLE_API_ERRORS = (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError)
+
+# Concurrency Constants
+PROPOSALS_PER_REQUEST: int = 10  # Max proposals batched into one API call in async mode
+DEFAULT_API_CONCURRENCY: int = 4 # Max parallel API requests in async mode
+MAX_SAVE_WORKERS: int = 8        # Max threads for writing proposal files
+
+# Logging is configured in main() (or by the importing application)
+
+# === JSON Helpers ===
+_JSON_DECODER = json.JSONDecoder() # raw_decode() scans one value at an offset (C scanner); orjson has no equivalent
+
+def _json_loads(data: Any) -> Any:
+    """Parses JSON (str or bytes) with orjson if installed. Errors are json.JSONDecodeError in both cases."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _json_dumps_bytes(obj: Any) -> bytes:
+    """Serializes obj to UTF-8 JSON bytes (non-ASCII characters are kept as-is)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+# === Prompt Helpers ===
+@functools.lru_cache(maxsize=64)
+def _build_prompt(template: str, genres_key: Tuple[str, ...], anzahl: int) -> str:
+    """Formats a prompt template. Memoized, since concurrent batches reuse identical prompts."""
+    return template.format(
+        genres_str=', '.join(genres_key), # Comma-separated list of genres
+        anzahl=anzahl, # 'anzahl' is the key in the prompt templates
+        min_worte=DEFAULT_TARGET_WORDS_MIN, # 'min_worte' key
+        max_worte=DEFAULT_TARGET_WORDS_MAX # 'max_worte' key
+    )
 
-# Logging configuration
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class PromptSettingGenerator:
     """
@@ -50,26 +110,22 @@ class PromptSettingGenerator:
             "PROMPT_SYSTEM": """Du bist ein kreativer Ideengenerator für Geschichten. Deine Aufgabe ist es, Prompts und Settings für fesselnde Geschichten zu erstellen.
 Genres/Themen: {genres_str}
 Generiere {anzahl} verschiedene Ideen.
-Für jede Idee:
-1. Prompt: Detaillierte Prämisse/Grundidee (100-200 Wörter).
-2. Setting: Passende atmosphärische Beschreibung (Ort, Zeit, Stimmung) (50-100 Wörter).
-3. Titel: Kurzer, einprägsamer Titel.
-4. Genre: Das Hauptgenre dieser Idee (aus den Vorgaben).
-5. Wortanzahl: Eine zufällige Zahl zwischen {min_worte} und {max_worte}.
+Für jede Idee (JSON-Schlüssel in Klammern):
+1. Prompt ("p"): Prägnante Prämisse/Grundidee mit Hauptfigur, Konflikt und Wendung (höchstens 120 Wörter).
+2. Setting ("s"): Atmosphärische Beschreibung (Ort, Zeit, Stimmung) (höchstens 40 Wörter).
+3. Titel ("t"): Kurzer, einprägsamer Titel.
+4. Genre ("g"): Das Hauptgenre dieser Idee (aus den Vorgaben).
+5. Wortanzahl ("w"): Eine zufällige Zahl zwischen {min_worte} und {max_worte}.
 
 WICHTIG: Die generierten Titel, Prompts und Settings MÜSSEN auf Deutsch sein.
 
-Formatiere deine Antwort NUR als valides JSON-Array:
-[
-    {{
-        "titel": "...",
-        "prompt": "...",
-        "setting": "...",
-        "genre": "...",
-        "wortanzahl": ...
-    }},
-    ...
-]
+Formatiere deine Antwort NUR als valides JSON-Objekt mit allen {anzahl} Ideen im Array "proposals":
+{{
+    "proposals": [
+        {{"t": "...", "p": "...", "s": "...", "g": "...", "w": ...}},
+        ...
+    ]
+}}
 Sei kreativ und originell. Füge unerwartete Wendungen und interessante Konflikte ein. Gib NUR das JSON zurück, ohne einleitenden oder abschließenden Text.""",
             "USER_PROMPT": "Generiere {anzahl} kreative Geschichtsideen als JSON basierend auf Genres: {genres_str}.",
             "ERROR_MISSING_API_KEY": "API-Schlüssel ist erforderlich. Bitte NEBIUS_API_KEY setzen oder übergeben.",
@@ -112,26 +168,22 @@ Sei kreativ und originell. Füge unerwartete Wendungen und interessante Konflikt
             "PROMPT_SYSTEM": """You are an imaginative story idea generator. Your task is to create prompts and settings for captivating stories.
 Genres/Themes: {genres_str}
 Generate {anzahl} different ideas.
-For each idea:
-1. Prompt: Detailed premise/basic idea (100-200 words).
-2. Setting: Appropriate atmospheric description (place, time, mood) (50-100 words).
-3. Title: Short, memorable title.
-4. Genre: The main genre of this idea (from the provided list).
-5. Wordcount: A random number between {min_worte} and {max_worte}.
+For each idea (JSON key in parentheses):
+1. Prompt ("p"): Concise premise/basic idea with protagonist, conflict and twist (at most 120 words).
+2. Setting ("s"): Atmospheric description (place, time, mood) (at most 40 words).
+3. Title ("t"): Short, memorable title.
+4. Genre ("g"): The main genre of this idea (from the provided list).
+5. Wordcount ("w"): A random number between {min_worte} and {max_worte}.
 
 IMPORTANT: The generated titles, prompts, and settings MUST be in English.
 
-Format your response ONLY as a valid JSON array:
-[
-    {{
-        "title": "...",
-        "prompt": "...",
-        "setting": "...",
-        "genre": "...",
-        "wordcount": ...
-    }},
-    ...
-]
+Format your response ONLY as a valid JSON object with all {anzahl} ideas in the "proposals" array:
+{{
+    "proposals": [
+        {{"t": "...", "p": "...", "s": "...", "g": "...", "w": ...}},
+        ...
+    ]
+}}
 Be creative and original. Add unexpected twists and interesting conflicts. Return ONLY the JSON, with no introductory or concluding text.""",
             "USER_PROMPT": "Generate {anzahl} creative story ideas as JSON based on genres: {genres_str}.",
             "ERROR_MISSING_API_KEY": "API key required. Please set NEBIUS_API_KEY or pass directly.",
@@ -173,13 +225,18 @@ Be creative and original. Add unexpected twists and interesting conflicts. Retur
 
     def __init__(self, api_key: Optional[str] = None,
                  proposals_folder: str = DEFAULT_PROPOSALS_FOLDER,
-                 model: str = MODELL_NAME):
+                 model: str = MODELL_NAME,
+                 use_cache: bool = False,
+                 http_client: Optional[httpx.Client] = None):
         """
         Initializes the PromptSettingGenerator.
         Args:
             api_key: Nebius API key (can be None, checks environment variable).
             proposals_folder: Directory to store generated proposal files.
             model: Name of the language model to use.
+            use_cache: Serve proposals from a pool in CACHE_DIR (per genre set and language) and only
+                       request the missing ones from the API.
+            http_client: Optional shared HTTP client (keeps connections alive across generators).
         """
         resolved_api_key = api_key or os.environ.get("NEBIUS_API_KEY")
         # Use 'de' for initialization errors first, fallback to 'en' if needed
@@ -188,69 +245,134 @@ Be creative and original. Add unexpected twists and interesting conflicts. Retur
             # Raise error if API key is not found
             raise ValueError(lang_conf_init["ERROR_MISSING_API_KEY"])
 
-        self.client = OpenAI(base_url=API_BASE_URL, api_key=resolved_api_key)
+        self.client = OpenAI(base_url=API_BASE_URL, api_key=resolved_api_key, http_client=http_client)
         self.proposals_folder = proposals_folder
         self.model_name = model
+        self.use_cache = use_cache
+        # Filename suffix: one timestamp per run plus a counter (unique even within the same second)
+        self._run_timestamp = time.strftime("%Y%m%d_%H%M%S")
+        self._file_counter = itertools.count(1)
+        self._ensured_dirs: set = set() # Directories already created/verified by this instance
         # Ensure the default proposals folder exists when the generator is created
         try:
             os.makedirs(self.proposals_folder, exist_ok=True)
+            self._ensured_dirs.add(self.proposals_folder)
         except OSError as e:
             logging.warning(f"Could not create proposals folder '{self.proposals_folder}': {e}")
 
 
-    def _get_lang_config(self, language_code: str) -> Dict[str, Any]:
-        """Gets the configuration dictionary for the specified language code (e.g., 'de', 'en')."""
-        config = self.LANGUAGE_CONFIG.get(language_code.lower())
+    @classmethod
+    @functools.lru_cache(maxsize=8)
+    def _get_lang_config(cls, language_code: str) -> Dict[str, Any]:
+        """Gets the configuration dictionary for the specified language code (e.g., 'de', 'en'). Cached per class and code."""
+        config = cls.LANGUAGE_CONFIG.get(language_code.lower())
         if not config:
             # Raise error if the language code is not supported
-            supported_langs = list(self.LANGUAGE_CONFIG.keys())
+            supported_langs = list(cls.LANGUAGE_CONFIG.keys())
             raise ValueError(f"Language code '{language_code}' not supported. Available codes: {supported_langs}")
         return config
 
+    def _cache_path(self, genres: List[str], language_code: str) -> str:
+        """
+        Returns the cache pool file for a genre set and language. Genres are normalized (case, order),
+        so structurally identical requests share one pool; the prompt template is part of the key.
+        """
+        lang_conf = self._get_lang_config(language_code)
+        genres_key = sorted({g.strip().lower() for g in genres})
+        key = repr((genres_key, language_code.lower(), self.model_name, lang_conf["PROMPT_SYSTEM"]))
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(CACHE_DIR, "ideas", f"{digest}.json")
+
+    def _load_cached_proposals(self, cache_path: str) -> Optional[List[Dict[str, Any]]]:
+        """Loads cached proposals, or returns None on a cache miss or unreadable file."""
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = _json_loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Ignoring unreadable cache file '{cache_path}': {e}")
+            return None
+        return cached if isinstance(cached, list) and cached else None
+
+    def _store_cached_proposals(self, cache_path: str, proposals: List[Dict[str, Any]]) -> None:
+        """Writes proposals to the cache atomically (temp file + os.replace)."""
+        try:
+            cache_dir = os.path.dirname(cache_path)
+            os.makedirs(cache_dir, exist_ok=True)
+            temp_fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(temp_fd, 'wb') as f:
+                    f.write(_json_dumps_bytes(proposals))
+                os.replace(temp_path, cache_path) # Readers never see a half-written file
+            except BaseException:
+                # Don't leave orphaned .tmp files in the cache dir
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+                raise
+            logging.debug(f"Proposals cached at: {cache_path}")
+        except OSError as e:
+            logging.warning(f"Could not write proposal cache '{cache_path}': {e}")
+
+    @staticmethod
+    def _retry_after_seconds(error: Exception) -> Optional[float]:
+        """Returns the Retry-After delay (seconds) sent with an API error response, if any."""
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if not headers:
+            return None
+        try:
+            return min(max(float(headers.get("retry-after")), 0.0), MAX_RETRY_AFTER_S)
+        except (TypeError, ValueError): # Missing or HTTP-date value
+            return None
+
     def retry_api_call(self, call_function, *args, **kwargs):
             """
-            Executes an API call with automatic retries using exponential backoff for specific errors.
+            Executes an API call with automatic retries using exponential backoff for temporary
+            server errors (RETRYABLE_API_ERRORS). Any other error is raised immediately.
             """
             retries = 0
-            # Use 'de' config for retry messages, fallback to 'en'
-            lang_conf_retry = self.LANGUAGE_CONFIG.get("de", self.LANGUAGE_CONFIG.get("en"))
+            # Use 'de' config for retry messages (memoized lookup, once per call)
+            lang_conf_retry = self._get_lang_config("de")
             while retries <= MAX_RETRIES:
                 try:
                     # Attempt the API call
                     return call_function(*args, **kwargs)
-                except Exception as e:
-                    error_str = str(e).lower()
-                    # Check if the error is likely a temporary server issue
-                    is_retryable = ("overloaded" in error_str or "rate_limit" in error_str or
-                                    "timeout" in error_str or "503" in error_str or "504" in error_str)
-
-                    if is_retryable and retries < MAX_RETRIES:
+                except RETRYABLE_API_ERRORS as e:
+                    if retries < MAX_RETRIES:
                         retries += 1
-                        # Calculate delay with exponential backoff and jitter
-                        delay = (DEFAULT_RETRY_DELAY_S * (RETRY_BACKOFF_FACTOR ** (retries - 1)) +
-                                random.uniform(0.1, 0.5)) # Add random jitter
+                        # Honor the server's Retry-After header, otherwise exponential backoff and jitter
+                        delay = self._retry_after_seconds(e)
+                        if delay is None:
+                            delay = _RETRY_DELAYS[retries - 1] + random.uniform(0.1, 0.5) # Add random jitter
                         logging.warning(lang_conf_retry["ERROR_API_OVERLOAD"].format(
                             delay=delay, retries=retries, max_retries=MAX_RETRIES
-                        ))
+                        ) + f" ({type(e).__name__})")
                         time.sleep(delay) # Wait before retrying
                     else:
-                        # If error is not retryable or max retries reached, log and re-raise
+                        # Max retries reached, log and re-raise
                         logging.error(lang_conf_retry["ERROR_API_CALL_FAILED"].format(error=str(e)))
                         raise # Re-raise the original exception
+                except Exception as e:
+                    # Not a temporary server issue (e.g. bad request, authentication): fail immediately
+                    logging.error(lang_conf_retry["ERROR_API_CALL_FAILED"].format(error=str(e)))
+                    raise
             # This should not be reached if the loop works correctly, but raise error just in case
             raise Exception(lang_conf_retry["ERROR_ALL_RETRIES_FAILED"])
 
     def _create_system_prompt(self, genres: List[str], count: int, language_code: str) -> str:
         """Creates the system prompt content for the API request."""
         lang_conf = self._get_lang_config(language_code)
-        genres_str = ', '.join(genres) # Comma-separated list of genres
-        # Format the prompt template with provided details
-        return lang_conf["PROMPT_SYSTEM"].format(
-            genres_str=genres_str,
-            anzahl=count, # 'anzahl' is the key in the prompt template
-            min_worte=DEFAULT_TARGET_WORDS_MIN, # 'min_worte' key
-            max_worte=DEFAULT_TARGET_WORDS_MAX # 'max_worte' key
-        )
+        # Format the prompt template with provided details (genre order is kept as given)
+        return _build_prompt(lang_conf["PROMPT_SYSTEM"], tuple(genres), count)
+
+    @staticmethod
+    def _unwrap_proposals(parsed: Any) -> List[Any]:
+        """Returns the proposal list from parsed JSON ({"proposals": [...]} or a bare array)."""
+        if isinstance(parsed, dict) and isinstance(parsed.get("proposals"), list):
+            return parsed["proposals"]
+        return parsed if isinstance(parsed, list) else []
 
     def _parse_json_response(self, response_text: str, language_code: str) -> List[Dict[str, Any]]:
         """
@@ -259,30 +381,32 @@ Be creative and original. Add unexpected twists and interesting conflicts. Retur
         """
         lang_conf = self._get_lang_config(language_code)
         proposals = []
-        json_str = None
+        parse_error: Optional[json.JSONDecodeError] = None
 
-        # Attempt 1: Use regex to find JSON within ```json ... ``` or just [...]
-        # re.DOTALL makes '.' match newlines too. re.IGNORECASE for `json`.
-        match = re.search(r'```json\s*(\[.*?\])\s*```|(\[.*?\])', response_text, re.DOTALL | re.IGNORECASE)
+        # Attempt 0: The whole response is valid JSON ({"proposals": [...]} or a bare array)
+        try:
+            proposals = self._unwrap_proposals(_json_loads(response_text))
+            if proposals:
+                logging.debug("JSON successfully parsed directly from the response.")
+        except json.JSONDecodeError as e:
+            parse_error = e # Fall through to extraction/repair below
 
-        if match:
-            # Group 1 captures content inside ```json blocks, Group 2 captures raw [...]
-            json_str = match.group(1) or match.group(2)
+        if not proposals:
+            # Attempt 1: JSON wrapped in a markdown code block (```json ... ```)
+            fenced = response_text.partition("```")[2]
+            if fenced:
+                if fenced[:4].lower() == "json":
+                    fenced = fenced[4:]
+                try:
+                    proposals = self._unwrap_proposals(_json_loads(fenced.partition("```")[0]))
+                    logging.debug("JSON successfully parsed from a markdown code block.")
+                except json.JSONDecodeError as e:
+                    parse_error = e
 
-        if json_str:
-            try:
-                # Try parsing the extracted string directly
-                proposals = json.loads(json_str)
-                logging.debug("JSON successfully parsed using regex and json.loads.")
-            except json.JSONDecodeError as e:
-                # If direct parsing fails, log the error and attempt repair
-                logging.warning(lang_conf["ERROR_JSON_PARSE"].format(error=e))
-                logging.info(lang_conf["INFO_TRY_REPAIR_JSON"])
-                # Use the repair function on the *original* response_text, as regex might have missed parts
-                proposals = self._repair_incomplete_json(response_text, language_code)
-        else:
-            # Attempt 2: If regex didn't find anything promising, try repairing the whole response
-            logging.warning(lang_conf["ERROR_NO_JSON_FOUND"])
+        if not proposals:
+            # Attempt 2: Extract every complete proposal object (truncated or malformed responses)
+            if parse_error is not None:
+                logging.warning(lang_conf["ERROR_JSON_PARSE"].format(error=parse_error))
             logging.info(lang_conf["INFO_TRY_REPAIR_JSON"])
             proposals = self._repair_incomplete_json(response_text, language_code)
 
@@ -294,8 +418,6 @@ Be creative and original. Add unexpected twists and interesting conflicts. Retur
 
         # Post-processing: Standardize keys and validate required fields
         processed_proposals = []
-        # Define required keys (using German keys as they are target in repair function)
-        required_keys = ["titel", "prompt", "setting", "genre", "wortanzahl"]
 
         # Check if the result is a list (expected)
         if not isinstance(proposals, list):
@@ -306,7 +428,10 @@ Be creative and original. Add unexpected twists and interesting conflicts. Retur
         for proposal_item in proposals:
             # Ensure each item is a dictionary
             if isinstance(proposal_item, dict):
-                # Standardize keys (map English keys like 'title'/'wordcount' if present)
+                # Standardize keys (short keys from the prompt schema, English keys like 'title'/'wordcount')
+                for short_key, full_key in SHORT_PROPOSAL_KEYS.items():
+                    if short_key in proposal_item:
+                        proposal_item[full_key] = proposal_item.pop(short_key)
                 proposal_item["titel"] = proposal_item.pop("title", proposal_item.get("titel"))
                 proposal_item["wortanzahl"] = proposal_item.pop("wordcount", proposal_item.get("wortanzahl"))
 
@@ -317,7 +442,7 @@ Be creative and original. Add unexpected twists and interesting conflicts. Retur
                     proposal_item["genre"] = "[Unknown]" if language_code == 'en' else "[Unbekannt]"
 
                 # Check if all essential fields are present and non-empty
-                missing_keys = [k for k in required_keys if k not in proposal_item or not proposal_item[k]]
+                missing_keys = [k for k in REQUIRED_PROPOSAL_KEYS if not proposal_item.get(k)]
                 if not missing_keys:
                     processed_proposals.append(proposal_item)
                 else:
@@ -346,13 +471,10 @@ Be creative and original. Add unexpected twists and interesting conflicts. Retur
 
         # Create the prompts for the API call
         system_prompt = self._create_system_prompt(genres, count, language_code)
-        user_prompt = lang_conf["USER_PROMPT"].format(anzahl=count, genres_str=', '.join(genres))
+        user_prompt = _build_prompt(lang_conf["USER_PROMPT"], tuple(genres), count)
 
-        # Generate a timestamp for potential temporary filenames
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        # Create a secure temporary file path
-        temp_fd, temp_filename = tempfile.mkstemp(prefix=f"temp_proposals_{timestamp}_", suffix=".txt")
-        os.close(temp_fd) # Close the file descriptor, we only need the path
+        # Raw response text, kept in memory for the recovery attempt below
+        response_text = ""
 
         try:
             logging.info(lang_conf["INFO_WAITING_API"])
@@ -364,8 +486,9 @@ Be creative and original. Add unexpected twists and interesting conflicts. Retur
             if use_json_format:
                  logging.debug("Requesting JSON object format from the model.")
 
-            # Make the API call with retry logic
-            response = self.retry_api_call(
+            # Make the API call with retry logic. The response is streamed, so the text received
+            # before a dropped connection or timeout is kept for the partial-JSON recovery below.
+            stream = self.retry_api_call(
                 self.client.chat.completions.create,
                 model=self.model_name,
                 max_tokens=max(1500, count * 500), # Increase tokens based on proposal count
@@ -374,27 +497,18 @@ Be creative and original. Add unexpected twists and interesting conflicts. Retur
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                response_format=response_format_arg # Request JSON format if supported
+                response_format=response_format_arg, # Request JSON format if supported
+                stream=True
             )
 
-            # Extract the response content
-            response_content = response.choices[0].message.content
-
-            # If the model returns a structured JSON object directly (due to response_format)
-            # it might already be parsed. We need the string representation for parsing/repair.
-            if isinstance(response_content, (dict, list)):
-                 response_text = json.dumps(response_content)
-                 logging.debug("API returned structured JSON, converted back to string for parsing.")
-            else:
-                 response_text = str(response_content) # Treat as string
-
-            # Save the raw response text to the temporary file (for debugging)
+            # Collect the streamed text chunks
+            response_parts: List[str] = []
             try:
-                with open(temp_filename, 'w', encoding='utf-8') as f:
-                    f.write(response_text)
-                logging.debug(f"Raw API response saved to temporary file: {temp_filename}")
-            except Exception as e:
-                 logging.warning(f"Could not save raw response to temporary file: {e}")
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        response_parts.append(chunk.choices[0].delta.content)
+            finally:
+                response_text = "".join(response_parts) # Also set if the stream breaks off
 
             # Parse the response text to extract proposals
             return self._parse_json_response(response_text, language_code)
@@ -402,26 +516,89 @@ Be creative and original. Add unexpected twists and interesting conflicts. Retur
         except Exception as e:
             # Handle potential errors during the API call or parsing
             logging.error(f"Critical error during proposal generation: {str(e)}")
-            # Attempt to recover from the temporary file if it exists
-            if os.path.exists(temp_filename):
+            # Attempt to recover from the response received before the error (if any)
+            # Only attempt repair if there's substantial content
+            if len(response_text) > 50:
                 try:
-                    with open(temp_filename, 'r', encoding='utf-8') as f:
-                        partial_response = f.read()
-                    # Only attempt repair if there's substantial content
-                    if len(partial_response) > 50:
-                        logging.info(f"Attempting recovery from partial response ({len(partial_response)} chars).")
-                        return self._parse_json_response(partial_response, language_code)
+                    logging.info(f"Attempting recovery from partial response ({len(response_text)} chars).")
+                    return self._parse_json_response(response_text, language_code)
                 except Exception as e2:
-                    logging.error(f"Error reading temporary file during recovery: {str(e2)}")
+                    logging.error(f"Error during recovery from partial response: {str(e2)}")
             return [] # Return empty list on failure
-        finally:
-            # Always clean up the temporary file
-            if os.path.exists(temp_filename):
-                try:
-                    os.remove(temp_filename)
-                    logging.debug(f"Temporary file deleted: {temp_filename}")
-                except Exception as e:
-                    logging.warning(f"Could not delete temporary file: {e}")
+
+    @staticmethod
+    def _vary_cached_proposals(proposals: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Returns copies of cached proposals with a freshly drawn word count, so reused ideas vary."""
+        return [dict(proposal, wortanzahl=random.randint(DEFAULT_TARGET_WORDS_MIN, DEFAULT_TARGET_WORDS_MAX))
+                for proposal in proposals]
+
+    async def generate_proposals_async(self, genres: List[str], count: int = 3, language_code: str = "de",
+                                       concurrency: int = DEFAULT_API_CONCURRENCY) -> List[Dict[str, Any]]:
+        """
+        Generates proposals concurrently by splitting `count` into several smaller API requests.
+        Each request runs `generate_proposals` in a worker thread; at most `concurrency`
+        requests are in flight at the same time.
+        With `use_cache`, proposals are sampled from the cached pool for these genres first and
+        only the shortfall is requested from the API (new proposals are added to the pool).
+        Args:
+            genres: A list of genres/themes to base the ideas on.
+            count: The total number of proposals to generate.
+            language_code: The language code ('de' or 'en') for the proposals.
+            concurrency: Maximum number of parallel API requests.
+        Returns:
+            A list of all successfully generated proposals (may be shorter than `count`).
+        """
+        if count <= 0:
+            return []
+        pool: List[Dict[str, Any]] = []
+        cache_path = self._cache_path(genres, language_code) if self.use_cache else None
+        if cache_path:
+            pool = self._load_cached_proposals(cache_path) or []
+            if len(pool) >= count:
+                logging.info(f"Using {count} of {len(pool)} cached proposals from: {cache_path}")
+                return self._vary_cached_proposals(random.sample(pool, count)) # Without replacement
+            if pool:
+                logging.info(f"Using {len(pool)} cached proposals, requesting {count - len(pool)} new ones.")
+
+        new_proposals = await self._generate_batches_async(genres, count - len(pool), language_code, concurrency)
+        if cache_path and new_proposals:
+            self._store_cached_proposals(cache_path, (pool + new_proposals)[-MAX_CACHED_PROPOSALS:])
+        return self._vary_cached_proposals(pool) + new_proposals
+
+    async def _generate_batches_async(self, genres: List[str], count: int, language_code: str,
+                                      concurrency: int) -> List[Dict[str, Any]]:
+        """Requests `count` new proposals from the API in concurrent batches (see generate_proposals_async)."""
+        # Split the total count into k evenly sized batches, e.g. 12 -> [6, 6] instead of [10, 2],
+        # so no single request (and its output length) dominates the wall-clock time
+        batch_total = -(-count // PROPOSALS_PER_REQUEST) # ceil(count / PROPOSALS_PER_REQUEST)
+        base_size, remainder = divmod(count, batch_total)
+        batch_sizes = [base_size + 1] * remainder + [base_size] * (batch_total - remainder)
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        loop = asyncio.get_running_loop()
+
+        async def run_batch(batch_count: int) -> List[Dict[str, Any]]:
+            async with semaphore:
+                # The sync client blocks, so run each request in the default thread pool
+                return await loop.run_in_executor(None, self.generate_proposals, genres, batch_count, language_code)
+
+        logging.debug(f"Generating {count} proposals in {len(batch_sizes)} concurrent request(s): {batch_sizes}")
+        results = await asyncio.gather(*(run_batch(n) for n in batch_sizes), return_exceptions=True)
+
+        proposals: List[Dict[str, Any]] = []
+        for result in results:
+            if isinstance(result, Exception):
+                # generate_proposals handles its own errors, but guard against anything unexpected
+                logging.error(f"Proposal batch failed: {result}")
+                continue
+            proposals.extend(result)
+
+        # Fallback: if the batched response was incomplete, request only the missing proposals once more
+        missing_count = count - len(proposals)
+        if 0 < missing_count < count:
+            logging.info(f"Batched response contained {len(proposals)}/{count} usable proposals. Requesting {missing_count} more.")
+            proposals.extend(await loop.run_in_executor(None, self.generate_proposals, genres, missing_count, language_code))
+        return proposals[:count]
 
     def _repair_incomplete_json(self, partial_response: str, language_code: str) -> List[Dict[str, Any]]:
         """
@@ -432,90 +609,40 @@ Be creative and original. Add unexpected twists and interesting conflicts. Retur
         proposals = []
         logging.debug(f"Attempting to repair JSON from: {partial_response[:200]}...") # Log start of text
 
-        # Try to find the start of a JSON array '[' or object '{'
+        # Try to find the start of the JSON array '[' (proposals contain no nested arrays,
+        # so this also skips a {"proposals": [...]} wrapper), otherwise the first object '{'
         json_array_start = partial_response.find('[')
-        json_object_start = partial_response.find('{')
-
-        start_index = -1
-        if json_array_start != -1 and (json_object_start == -1 or json_array_start < json_object_start):
-            start_index = json_array_start
-        elif json_object_start != -1:
-            start_index = json_object_start
+        start_index = json_array_start if json_array_start != -1 else partial_response.find('{')
 
         if start_index == -1:
-            logging.debug("No '[' or '{' found in the partial response.")
+            logging.warning(lang_conf["ERROR_NO_JSON_FOUND"])
             return [] # Cannot find start of JSON structure
 
         raw_content = partial_response[start_index:]
 
-        # Iterate through the string trying to find complete '{...}' blocks
+        # Decode one complete '{...}' object after another with the C scanner (raw_decode);
+        # strings, escapes and nesting are handled there instead of a Python loop per character
         cursor = 0
-        while cursor < len(raw_content):
+        while True:
             obj_start = raw_content.find('{', cursor)
             if obj_start == -1:
                 break # No more starting braces found
-
-            nest_level = 0
-            obj_end = -1
-            in_string = False
-            escaped = False
-
-            # Scan from the object start to find the matching closing brace '}'
-            for i in range(obj_start, len(raw_content)):
-                char = raw_content[i]
-
-                if in_string:
-                    if char == '"' and not escaped:
-                        in_string = False
-                    # Handle escaped backslash correctly
-                    elif char == '\\':
-                        escaped = not escaped
-                    else:
-                        escaped = False
-                else: # Not inside a string
-                    if char == '"':
-                        in_string = True
-                        escaped = False
-                    elif char == '{':
-                        nest_level += 1
-                    elif char == '}':
-                        nest_level -= 1
-                        if nest_level == 0: # Found the matching closing brace
-                            obj_end = i
-                            break # Stop scanning for this object
-                    # Ignore other characters outside strings for nesting level
-
-                # Reset escape flag if the current char is not a backslash
-                # This handles cases like "\\", where the second '\' is escaped by the first.
-                if char != '\\':
-                     escaped = False
-
-
-            if obj_end > obj_start:
-                # Found a potential complete object string
-                object_str = raw_content[obj_start : obj_end + 1]
-                logging.debug(f"Potential JSON object found: {object_str[:100]}...")
-                try:
-                    # Try parsing this individual object string
-                    proposal = json.loads(object_str)
-                    # Validate if it's a dictionary (basic check)
-                    if isinstance(proposal, dict):
-                        # Add the valid proposal (further validation happens in _parse_json_response)
-                        proposals.append(proposal)
-                    else:
-                         logging.debug(f"Parsed object is not a dictionary: {type(proposal)}")
-
-                except json.JSONDecodeError as json_err:
-                    # Log if parsing the extracted object fails
-                    logging.debug(f"Could not parse extracted JSON object: {json_err} - Object string: {object_str[:100]}...")
-                    pass # Ignore invalid fragments
-
-                # Move cursor to continue searching after the found object
-                cursor = obj_end + 1
+            try:
+                proposal, obj_end = _JSON_DECODER.raw_decode(raw_content, obj_start)
+            except json.JSONDecodeError as json_err:
+                # Incomplete or invalid fragment (e.g. the truncated last object): try the next brace
+                logging.debug(f"Could not parse JSON object at index {obj_start + start_index}: {json_err}")
+                cursor = obj_start + 1
+                continue
+
+            # Validate if it's a dictionary (basic check)
+            if isinstance(proposal, dict):
+                # Add the valid proposal (further validation happens in _parse_json_response)
+                proposals.append(proposal)
             else:
-                # No matching closing brace found for the current starting brace
-                logging.debug(f"No matching '}}' found for '{{' starting at index {obj_start + start_index} in original string.")
-                break # Stop searching
+                logging.debug(f"Parsed object is not a dictionary: {type(proposal)}")
+            # Move cursor to continue searching after the decoded object
+            cursor = obj_end
 
         if proposals:
              # Use the correct language config key here
@@ -528,15 +655,94 @@ Be creative and original. Add unexpected twists and interesting conflicts. Retur
     def _safe_filename(self, title: str) -> str:
         """Creates a safe filename string from a title."""
         # Remove characters that are not alphanumeric, underscore, hyphen, or whitespace
-        safe_title = re.sub(r'[^\w\s-]', '', title).strip()
+        safe_title = _RE_UNSAFE_FILENAME_CHARS.sub('', title).strip()
         # Replace whitespace sequences with a single underscore
-        safe_title = re.sub(r'\s+', '_', safe_title)
+        safe_title = _RE_WHITESPACE.sub('_', safe_title)
         # Truncate to a reasonable length
         return safe_title[:50]
 
+    @staticmethod
+    def _is_dir(path: str, dir_cache: Optional[Dict[str, bool]] = None) -> bool:
+        """Single os.stat directory check; results are memoized in `dir_cache` (shared across a batch save)."""
+        if dir_cache is not None and path in dir_cache:
+            return dir_cache[path]
+        try:
+            result = stat.S_ISDIR(os.stat(path).st_mode)
+        except OSError: # Missing path or no permission
+            result = False
+        if dir_cache is not None:
+            dir_cache[path] = result
+        return result
+
+    def _resolve_proposal_path(self, base_filename: str, output_path: Optional[str] = None,
+                               use_proposals_folder: bool = False,
+                               dir_cache: Optional[Dict[str, bool]] = None) -> Tuple[str, str]:
+        """Returns (target_dir, final_filename) for saving a proposal (see save_proposal_as_txt)."""
+        target_dir = "." # Default to current directory
+        final_filename = base_filename # Default filename in current dir
+
+        if use_proposals_folder:
+            # Force saving to the dedicated proposals folder
+            target_dir = self.proposals_folder
+            final_filename = os.path.join(target_dir, base_filename)
+        elif output_path:
+            # User provided a specific output path
+            output_path = os.path.normpath(output_path) # Normalize path separators
+            # Check if it looks like a directory (ends in separator, has no extension, or is an existing dir).
+            # The string checks come first so the stat only runs for paths with an extension.
+            if (output_path.endswith(os.sep) or not os.path.splitext(output_path)[1]
+                    or self._is_dir(output_path, dir_cache)):
+                 # Treat as directory
+                 target_dir = output_path
+                 final_filename = os.path.join(target_dir, base_filename)
+            else:
+                 # Treat as a specific file path
+                 final_filename = output_path
+                 target_dir = os.path.dirname(final_filename)
+                 # If dirname is empty (e.g., "myfile.txt"), use current directory
+                 if not target_dir:
+                     target_dir = "."
+        return target_dir, final_filename
+
+    def _ensure_directory(self, target_dir: str) -> None:
+        """
+        Creates the target directory if it doesn't exist (idempotent). Raises OSError on failure.
+        Each directory is only checked once per generator instance.
+        """
+        # Handle case where target_dir might be empty if only a filename was given
+        target_dir = target_dir if target_dir else "."
+        if target_dir in self._ensured_dirs:
+            return
+        try:
+            os.makedirs(target_dir, exist_ok=True)
+        except OSError as e:
+            logging.error(f"Error creating directory '{target_dir}': {e}")
+            raise # Propagate the error
+        self._ensured_dirs.add(target_dir)
+
+    @staticmethod
+    def _quote_cmd_arg(arg: str) -> str:
+        """Quotes an argument for the Windows cmd example line (only if needed)."""
+        if arg and not _RE_CMD_NEEDS_QUOTES.search(arg):
+            return arg
+        return '"' + arg.replace('"', '""') + '"' # cmd.exe escapes a quote inside quotes by doubling it
+
+    @staticmethod
+    def _write_file_bytes(path: str, data: bytes) -> None:
+        """Writes pre-encoded data with a raw file descriptor (no TextIOWrapper/buffer layers for one small write)."""
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666) # The umask applies, like open()
+        try:
+            view = memoryview(data)
+            while view: # os.write may write less than requested
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+
     def save_proposal_as_txt(self, proposal: Dict[str, Any], language_code: str,
                              output_path: Optional[str] = None,
-                             use_proposals_folder: bool = False) -> str:
+                             use_proposals_folder: bool = False,
+                             ensure_dir: bool = True,
+                             dir_cache: Optional[Dict[str, bool]] = None) -> str:
         """
         Saves a single proposal dictionary as a formatted text file.
 
@@ -549,6 +755,8 @@ Be creative and original. Add unexpected twists and interesting conflicts. Retur
             language_code: 'de' or 'en'.
             output_path: Specific directory or file path for saving.
             use_proposals_folder: If True, forces saving into `self.proposals_folder`.
+            ensure_dir: Create the target directory first (callers saving a batch do this once).
+            dir_cache: Optional memo of directory checks, shared by batch saves to avoid repeated stats.
 
         Returns:
             The full path of the saved file.
@@ -559,94 +767,57 @@ Be creative and original. Add unexpected twists and interesting conflicts. Retur
         lang_conf = self._get_lang_config(language_code)
         # Create a safe base filename from the title
         safe_title = self._safe_filename(proposal.get("titel", "No_Title" if language_code == 'en' else "Ohne_Titel"))
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = f"{self._run_timestamp}_{next(self._file_counter):04d}" # next() on a count is thread-safe
         base_filename = f"proposal_{safe_title}_{timestamp}.txt" if language_code == 'en' else f"vorschlag_{safe_title}_{timestamp}.txt"
 
         # --- Determine the final target directory and filename ---
-        target_dir = "." # Default to current directory
-        final_filename = base_filename # Default filename in current dir
-
-        if use_proposals_folder:
-            # Force saving to the dedicated proposals folder
-            target_dir = self.proposals_folder
-            final_filename = os.path.join(target_dir, base_filename)
-        elif output_path:
-            # User provided a specific output path
-            output_path = os.path.normpath(output_path) # Normalize path separators
-            # Check if it looks like a directory (ends in separator, is an existing dir, or has no extension)
-            if output_path.endswith(os.sep) or os.path.isdir(output_path) or not os.path.splitext(output_path)[1]:
-                 # Treat as directory
-                 target_dir = output_path
-                 final_filename = os.path.join(target_dir, base_filename)
-            else:
-                 # Treat as a specific file path
-                 final_filename = output_path
-                 target_dir = os.path.dirname(final_filename)
-                 # If dirname is empty (e.g., "myfile.txt"), use current directory
-                 if not target_dir:
-                     target_dir = "."
+        target_dir, final_filename = self._resolve_proposal_path(base_filename, output_path, use_proposals_folder,
+                                                                 dir_cache)
 
         # --- Ensure the target directory exists ---
-        try:
-            # Create directory if it doesn't exist (idempotent)
-            # Handle case where target_dir might be empty if only a filename was given
-            os.makedirs(target_dir if target_dir else ".", exist_ok=True)
-        except OSError as e:
-            logging.error(f"Error creating directory '{target_dir}': {e}")
-            raise # Propagate the error
-
-        # Adjust final_filename if only directory was specified originally
-        if os.path.isdir(final_filename): # If final_filename resolved to a directory
-             final_filename = os.path.join(final_filename, base_filename)
-
-
-        # --- Prepare the file content ---
-        content = f"{lang_conf['LABEL_TITLE']}: {proposal.get('titel', '[N/A]')}\n"
-        content += f"{lang_conf['LABEL_GENRE']}: {proposal.get('genre', '[N/A]')}\n"
-        # Use 'wortanzahl' key consistently for word count
-        content += f"{lang_conf['LABEL_WORDCOUNT']}: {proposal.get('wortanzahl', '[N/A]')}\n\n"
-        content += f"{lang_conf['LABEL_PROMPT']}:\n{proposal.get('prompt', '[N/A]')}\n\n"
-        content += f"{lang_conf['LABEL_SETTING']}:\n{proposal.get('setting', '[N/A]')}\n\n"
+        if ensure_dir:
+            self._ensure_directory(target_dir)
+
+        # final_filename is either <dir>/<new unique name> or an output path that the check above
+        # found not to be a directory, so no second isdir() check is needed here.
+
+        # --- Prepare the file content (collected as parts, joined once at the end) ---
+        parts = [
+            f"{lang_conf['LABEL_TITLE']}: {proposal.get('titel', '[N/A]')}\n",
+            f"{lang_conf['LABEL_GENRE']}: {proposal.get('genre', '[N/A]')}\n",
+            # Use 'wortanzahl' key consistently for word count
+            f"{lang_conf['LABEL_WORDCOUNT']}: {proposal.get('wortanzahl', '[N/A]')}\n\n",
+            f"{lang_conf['LABEL_PROMPT']}:\n{proposal.get('prompt', '[N/A]')}\n\n",
+            f"{lang_conf['LABEL_SETTING']}:\n{proposal.get('setting', '[N/A]')}\n\n",
+        ]
 
         # --- Add example execution commands ---
-        story_gen_script = lang_conf['CMD_GENERATOR_SCRIPT']
-        python_exec = lang_conf['CMD_PYTHON_EXECUTABLE']
         # Map language code ('de'/'en') to the full language name expected by story_generator.py
         lang_arg_story_gen = lang_conf['CMD_LANG_MAP'].get(language_code, language_code)
-
-        # Prepare arguments, ensuring proper quoting/escaping for command line
-        # Using repr() is a safe way to get a string representation suitable for shell commands
-        prompt_arg_repr = repr(str(proposal.get('prompt', '')))
-        setting_arg_repr = repr(str(proposal.get('setting', '')))
-        title_arg_repr = repr(str(proposal.get('titel', '')))
-        wordcount_arg = str(proposal.get('wortanzahl', '')) # Should be a string number
-
-        # Example command (adjust based on actual story_generator args)
-        # NOTE: Using f-strings with repr() for safer argument construction
-        command_base = (
-            f"{python_exec} {story_gen_script} "
-            f"--prompt {prompt_arg_repr} "
-            f"--setting {setting_arg_repr} "
-            f"--title {title_arg_repr} " # Use --title consistently
-            f"--wordcount {wordcount_arg} " # Use --wordcount consistently
-            f"--language {lang_arg_story_gen} " # Use --language consistently
-            f"{lang_conf['CMD_SAVE_TEXT_ARG']}" # Add --save-text flag
+        command_args = [
+            lang_conf['CMD_PYTHON_EXECUTABLE'], lang_conf['CMD_GENERATOR_SCRIPT'],
+            "--prompt", str(proposal.get('prompt', '')),
+            "--setting", str(proposal.get('setting', '')),
+            "--title", str(proposal.get('titel', '')), # Use --title consistently
+            "--wordcount", str(proposal.get('wortanzahl', '')), # Use --wordcount consistently
+            "--language", lang_arg_story_gen, # Use --language consistently
+            lang_conf['CMD_SAVE_TEXT_ARG'] # Add --save-text flag
             # Consider adding --output-dir argument here if needed
-            # f" {lang_conf['CMD_OUTPUT_DIR_ARG']} {repr(target_dir)}" # Example
+        ]
+        # Quote each argument once per shell: shlex for bash, double quotes for cmd
+        win_command = " ".join(self._quote_cmd_arg(arg) for arg in command_args)
+        unix_command = " ".join(shlex.quote(arg) for arg in command_args)
+
+        parts += (
+            "=== Example Execution Command (check quotes/escaping!) ===\n",
+            "REM Windows (cmd):\n", win_command, "\n\n",
+            "# Unix/Linux/MacOS (bash):\n", unix_command, "\n",
         )
-
-        # Add comments for different shells
-        win_cmd_example = f"REM Windows (cmd):\n{command_base}"
-        unix_cmd_example = f"# Unix/Linux/MacOS (bash):\n{command_base}"
-
-        content += "=== Example Execution Command (check quotes/escaping!) ===\n"
-        content += win_cmd_example + "\n\n"
-        content += unix_cmd_example + "\n"
+        content = "".join(parts)
 
         # --- Write the file ---
         try:
-            with open(final_filename, 'w', encoding='utf-8') as f:
-                f.write(content)
+            self._write_file_bytes(final_filename, content.encode('utf-8'))
             logging.info(lang_conf["INFO_SAVED_PROPOSAL"].format(dateiname=final_filename))
             return final_filename # Return the path of the saved file
         except IOError as e:
@@ -654,6 +825,64 @@ Be creative and original. Add unexpected twists and interesting conflicts. Retur
             raise # Propagate the error
 
 
+    def save_proposals_as_txt(self, proposals: List[Dict[str, Any]], language_code: str,
+                              output_path: Optional[str] = None,
+                              use_proposals_folder: bool = False) -> List[str]:
+        """
+        Saves all complete proposals via `save_proposal_as_txt`, writing the files in parallel threads.
+        Incomplete proposals are skipped and errors are logged per proposal.
+
+        Returns:
+            The paths of the saved files, in proposal order.
+        """
+        lang_conf = self._get_lang_config(language_code)
+        valid_items: List[Tuple[int, Dict[str, Any]]] = []
+        for i, proposal in enumerate(proposals, 1):
+            # Check for missing essential keys before attempting to save
+            if any(not proposal.get(k) for k in REQUIRED_PROPOSAL_KEYS): # Fast path: no list for complete proposals
+                missing_keys = [k for k in REQUIRED_PROPOSAL_KEYS if not proposal.get(k)]
+                logging.warning(lang_conf["WARN_INCOMPLETE_PROPOSAL"].format(idx=i, missing=', '.join(missing_keys)))
+                continue # Skip saving incomplete proposals
+            valid_items.append((i, proposal))
+        if not valid_items:
+            return []
+
+        # Create the target directory once for the whole batch instead of once per file
+        dir_cache: Dict[str, bool] = {} # Directory check done once for the whole batch
+        target_dir, single_file = self._resolve_proposal_path("", output_path, use_proposals_folder, dir_cache)
+        output_paths = {i: output_path for i, _ in valid_items}
+        # With an empty base filename, a directory target resolves to "<dir>/" and a file target to the file itself
+        if single_file and single_file != os.path.join(target_dir, "") and len(valid_items) > 1:
+            # output_path names one file: number it per proposal, so the parallel writes don't overwrite each other
+            root, ext = os.path.splitext(single_file)
+            output_paths = {i: f"{root}_{i}{ext}" for i, _ in valid_items}
+        try:
+            self._ensure_directory(target_dir)
+        except OSError as e:
+            for i, _ in valid_items:
+                logging.error(lang_conf["ERROR_SAVING_PROPOSAL"].format(idx=i, error=e))
+            return []
+
+        saved: Dict[int, str] = {}
+        # File writes release the GIL, so the proposals are written concurrently
+        with ThreadPoolExecutor(max_workers=min(MAX_SAVE_WORKERS, len(valid_items))) as executor:
+            futures = {
+                executor.submit(self.save_proposal_as_txt, proposal, language_code,
+                                output_path=output_paths[i], use_proposals_folder=use_proposals_folder,
+                                ensure_dir=False,
+                                dir_cache=dir_cache): i
+                for i, proposal in valid_items
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    saved[i] = future.result()
+                except Exception as e:
+                    # Log errors during saving
+                    logging.error(lang_conf["ERROR_SAVING_PROPOSAL"].format(idx=i, error=e))
+        return [saved[i] for i in sorted(saved)]
+
+
 # === Main Execution Function ===
 def main():
     parser = argparse.ArgumentParser(
@@ -684,6 +913,8 @@ def main():
     #                     help="Placeholder: Currently does not ignore existing proposals")
     parser.add_argument("--auto-save", action="store_true",
                         help=f"Automatically save all generated proposals to the folder specified by --proposals-folder")
+    parser.add_argument("--use-cache", action="store_true",
+                        help=f"Reuse cached proposals for the same genres/language and only request missing ones (stored in {CACHE_DIR})")
     parser.add_argument("--debug", action="store_true", help="Enable detailed debug logging")
 
     args = parser.parse_args()
@@ -718,17 +949,19 @@ def main():
         generator = PromptSettingGenerator(
             api_key=args.api_key,
             proposals_folder=args.proposals_folder,
-            model=args.model
+            model=args.model,
+            use_cache=args.use_cache
         )
         # Get language config based on user input *after* generator is initialized
         lang_conf = generator._get_lang_config(args.language_code)
 
         # --- Generate Proposals ---
-        proposals = generator.generate_proposals(
+        # Larger counts are split into several API requests that run concurrently
+        proposals = asyncio.run(generator.generate_proposals_async(
             selected_genres,
             args.proposal_count,
             args.language_code
-        )
+        ))
 
         if not proposals:
             # Log error and exit if no proposals could be generated
@@ -748,49 +981,25 @@ def main():
             # Display summary using language-specific labels
             print(lang_conf["INFO_PROPOSAL_SUMMARY"].format(idx=i, titel=title, genre=genre, wortanzahl=wordcount))
             # Show truncated prompt/setting for brevity
-            prompt_summary = prompt_text[:150] + "..." if len(prompt_text) > 150 else prompt_text
-            setting_summary = setting_text[:100] + "..." if len(setting_text) > 100 else setting_text
+            prompt_summary = f"{prompt_text[:150]}..." if len(prompt_text) > 150 else prompt_text
+            setting_summary = f"{setting_text[:100]}..." if len(setting_text) > 100 else setting_text
             print(f"{lang_conf['LABEL_PROMPT']}: {prompt_summary}")
             print(f"{lang_conf['LABEL_SETTING']}: {setting_summary}")
             print("-" * 20)
 
-
         # --- Save Proposals ---
-        saved_files: List[str] = []
-        required_keys_for_saving = ["titel", "prompt", "setting", "genre", "wortanzahl"]
 
         if args.auto_save:
             # Save all proposals to the dedicated proposals folder
             logging.info(lang_conf["INFO_AUTO_SAVING_ALL"].format(folder=args.proposals_folder))
-            for i, proposal in enumerate(proposals, 1):
-                 # Check for missing essential keys before attempting to save
-                 missing_keys = [k for k in required_keys_for_saving if k not in proposal or not proposal[k]]
-                 if missing_keys:
-                     logging.warning(lang_conf["WARN_INCOMPLETE_PROPOSAL"].format(idx=i, missing=', '.join(missing_keys)))
-                     continue # Skip saving incomplete proposals
-                 try:
-                     # Call saving function, forcing use of proposals_folder
-                     filename = generator.save_proposal_as_txt(proposal, args.language_code, use_proposals_folder=True)
-                     saved_files.append(filename)
-                 except Exception as e:
-                     # Log errors during saving
-                     logging.error(lang_conf["ERROR_SAVING_PROPOSAL"].format(idx=i, error=e))
+            saved_files = generator.save_proposals_as_txt(proposals, args.language_code, use_proposals_folder=True)
         else:
              # Save proposals individually to the specified output directory (or current if '.')
-             # This loop is redundant if --auto-save is not used, but kept for clarity
+             # This is redundant if --auto-save is not used, but kept for clarity
              # and potential future use cases where saving individual files without auto-save is desired.
              logging.info(f"Saving proposal details to: {args.output_dir}")
-             for i, proposal in enumerate(proposals, 1):
-                 missing_keys = [k for k in required_keys_for_saving if k not in proposal or not proposal[k]]
-                 if missing_keys:
-                     logging.warning(lang_conf["WARN_INCOMPLETE_PROPOSAL"].format(idx=i, missing=', '.join(missing_keys)))
-                     continue
-                 try:
-                     # Pass the general output_dir for saving location
-                     filename = generator.save_proposal_as_txt(proposal, args.language_code, output_path=args.output_dir)
-                     saved_files.append(filename)
-                 except Exception as e:
-                      logging.error(lang_conf["ERROR_SAVING_PROPOSAL"].format(idx=i, error=e))
+             # Pass the general output_dir for saving location
+             saved_files = generator.save_proposals_as_txt(proposals, args.language_code, output_path=args.output_dir)
 
 
         # --- Interactive Selection / Execution ---
@@ -819,7 +1028,7 @@ def main():
             else:
                 # No interactive selection, choose randomly if proposals exist
                 if proposals:
-                    selected_proposal_index = random.randint(0, len(proposals) - 1)
+                    selected_proposal_index = random.randrange(len(proposals))
                     logging.info(lang_conf["INFO_RANDOM_CHOICE"].format(idx=selected_proposal_index + 1))
                 else:
                     # Should not happen if generation succeeded, but handle defensively
@@ -829,6 +1038,7 @@ def main():
             # --- Execute the selected proposal ---
             if selected_proposal_index is not None:
                 chosen_proposal = proposals[selected_proposal_index]
+                story_gen_script = lang_conf['CMD_GENERATOR_SCRIPT'] # Used for the command and all log lines below
                 logging.info(lang_conf["INFO_EXECUTING"].format(titel=chosen_proposal.get('titel', '[N/A]')))
 
                 # Prepare arguments for the story_generator.py script
@@ -840,10 +1050,11 @@ def main():
                 # Map language code ('de'/'en') to the full name expected by story_generator
                 language_arg_story = lang_conf['CMD_LANG_MAP'].get(args.language_code, args.language_code)
 
-                # Construct the command as a list of arguments for subprocess.run
+                import subprocess # Only needed for --execute
+                # Construct the command as a list of arguments for subprocess.Popen
                 command = [
                     lang_conf['CMD_PYTHON_EXECUTABLE'], # e.g., '/usr/bin/python3'
-                    lang_conf['CMD_GENERATOR_SCRIPT'], # e.g., 'story_generator.py'
+                    story_gen_script, # e.g., 'story_generator.py'
                     "--prompt", prompt_arg,
                     "--setting", setting_arg,
                     "--title", title_arg, # Use --title
@@ -868,30 +1079,26 @@ def main():
                 logging.debug(f"Executing command list: {command}")
 
                 try:
-                    # Execute the story generator script as a subprocess
-                    process = subprocess.run(
-                        command,
-                        check=False, # Don't raise exception on non-zero exit code automatically
-                        capture_output=True, # Capture stdout/stderr
-                        text=True, # Decode output as text
-                        encoding='utf-8' # Specify encoding
-                    )
+                    # Execute the story generator script as a subprocess.
+                    # Output is collected as raw bytes and decoded once (invalid UTF-8 is replaced, not fatal).
+                    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                    stdout_bytes, stderr_bytes = process.communicate()
                     # Log the output from the subprocess
-                    logging.info(f"'{lang_conf['CMD_GENERATOR_SCRIPT']}' STDOUT:\n{process.stdout}")
-                    if process.stderr:
+                    logging.info(f"'{story_gen_script}' STDOUT:\n{stdout_bytes.decode('utf-8', errors='replace')}")
+                    if stderr_bytes:
                          # Log stderr separately, often used for errors/warnings
-                         logging.error(f"'{lang_conf['CMD_GENERATOR_SCRIPT']}' STDERR:\n{process.stderr}")
+                         logging.error(f"'{story_gen_script}' STDERR:\n{stderr_bytes.decode('utf-8', errors='replace')}")
                     if process.returncode != 0:
                          # Log if the subprocess exited with an error code
-                         logging.error(f"'{lang_conf['CMD_GENERATOR_SCRIPT']}' exited with code {process.returncode}")
+                         logging.error(f"'{story_gen_script}' exited with code {process.returncode}")
 
                 except FileNotFoundError:
                     # Handle error if the story generator script itself is not found
-                    logging.error(f"Error: The script '{lang_conf['CMD_GENERATOR_SCRIPT']}' was not found.")
+                    logging.error(f"Error: The script '{story_gen_script}' was not found.")
                     logging.error("Please ensure it's in the same directory or in the system's PATH.")
                 except Exception as sub_e:
                     # Catch any other errors during subprocess execution
-                    logging.error(f"Error executing '{lang_conf['CMD_GENERATOR_SCRIPT']}': {sub_e}")
+                    logging.error(f"Error executing '{story_gen_script}': {sub_e}")
 
 
     except ValueError as ve:
@@ -4,34 +4,72 @@ import os
 import sys
 import argparse
 # import json # Not currently used
+import collections
 import datetime
+import functools
+import hashlib
 import time
 import math
 import re
+import shutil
+import stat
 import logging
 import tempfile
+import threading
 import random # for jitter in retry
-from typing import List, Tuple, Optional, Dict, Any
-from openai import OpenAI
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Tuple, Optional, Dict, Any, Callable
+import httpx # Installed with openai; used for an optional shared HTTP client
+from openai import (OpenAI, APIError, APIConnectionError, APITimeoutError, BadRequestError,
+                    InternalServerError, RateLimitError)
 from dotenv import load_dotenv
 
 load_dotenv() # Loads .env for API Key if not passed directly
 
 # === Configuration and Constants (Adopted from Web Script) ===
 MODELL_NAME = "microsoft/phi-4" # Or your preferred story model
+SUMMARY_MODELL_NAME = "meta-llama/Meta-Llama-3.1-8B-Instruct" # Suggested smaller, faster model for --summary-model (opt-in)
 API_BASE_URL = "https://api.studio.nebius.com/v1/"
 
 # Retry Constants
 DEFAULT_RETRY_DELAY_S: int = 15 # Longer delay for potentially longer tasks
 MAX_RETRIES: int = 3
 RETRY_BACKOFF_FACTOR: float = 1.5
+MAX_RETRY_AFTER_S: float = 120.0 # Upper bound for a server-provided Retry-After delay
+CIRCUIT_BREAKER_FAIL_MAX: int = 3 # Consecutive failed calls (after retries) before failing fast
+CIRCUIT_BREAKER_RESET_S: float = 60.0 # How long to fail fast before trying the API again
+# Backoff delay before retry n (index n-1), precomputed from the constants above
+_RETRY_DELAYS = tuple(DEFAULT_RETRY_DELAY_S * (RETRY_BACKOFF_FACTOR ** i) for i in range(MAX_RETRIES))
+# Temporary errors worth retrying (429, 5xx incl. "overloaded", timeouts, connection drops -
+# httpx transport errors surface directly when a streamed response breaks off)
+RETRYABLE_API_ERRORS = (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError, httpx.TransportError)
 
 # Word Count & Token Limits
 MIN_STORY_WORDS: int = 500
 MAX_STORY_WORDS_NO_CHAPTERS: int = 25000 # Theoretical limit for single call
 DEFAULT_TARGET_WORDS: int = 5000
 TOKEN_WORD_RATIO: float = 1.6 # Heuristic ratio
+TOKEN_WORD_RATIO_MIN: float = 1.2 # Clamp range for the ratio measured on generated chapters
+TOKEN_WORD_RATIO_MAX: float = 2.4
+MIN_WORDS_FOR_TOKEN_RATIO: int = 200 # Chapters shorter than this are not used to measure the ratio
 MAX_TOKENS_PER_CALL: int = 15000 # API Limit (Input + Output) - Check limits
+# Client-side rate limits per minute, set to the account's limits (0 disables; --rpm-limit/--tpm-limit or .env)
+def _env_int(name: str) -> int:
+    """Reads a non-negative integer from the environment; missing or malformed values give 0 (with a warning)."""
+    value = os.environ.get(name)
+    if not value:
+        return 0
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        logging.getLogger(__name__).warning(f"Ignoring invalid {name}={value!r} (expected an integer); using 0.")
+        return 0
+RPM_LIMIT: int = _env_int("STORY_GEN_RPM_LIMIT") # Requests
+TPM_LIMIT: int = _env_int("STORY_GEN_TPM_LIMIT") # Tokens (prompt + max output)
+PROMPT_TOKEN_SAFETY_MARGIN: int = 500 # Headroom for token estimate errors when fitting chapter prompts
+SUMMARY_MAX_TOKENS: int = 500 # Output cap for a chapter summary (prompt asks for 150-250 words)
+RUNNING_SUMMARY_MAX_TOKENS: int = 800 # Output cap for a running summary update/condensation
+SUMMARY_TOKEN_BUDGET: int = 1500 # Running summary size before the chapter summaries are condensed by the LLM
 MIN_CHAPTERS_LONG_STORY: int = 3
 TARGET_WORDS_PER_CHAPTER_DIVISOR: int = 2500
 WORD_COUNT_BUFFER_FACTOR: float = 2.8 # Buffer for LLM word count inaccuracy
@@ -39,15 +77,134 @@ WORD_COUNT_BUFFER_FACTOR: float = 2.8 # Buffer for LLM word count inaccuracy
 # Text Cleaning Constants
 MIN_WORDS_FOR_VALID_ENDING: int = 4
 MIN_CHARS_FOR_RESCUE: int = 100
+INCOMPLETE_ENDING_SCAN_CHARS: int = 512 # Tail length searched for an incomplete last sentence
+STREAM_CHECK_INTERVAL_CHUNKS: int = 50 # Check a streamed chapter for repetition loops every N chunks
+STREAM_CHECK_TAIL_CHARS: int = 1500 # Size of the text tail that is checked
+LOOP_MIN_PHRASE_CHARS: int = 40 # A repeated phrase shorter than this ("Help! Help!") is prose, not a loop
+LOOP_MIN_REPEATS: int = 6 # Consecutive occurrences of the phrase that count as a generation loop
+REPETITION_FREQUENCY_PENALTY: float = 0.6 # Used when re-issuing a chapter request that got stuck in a loop
+
+# Precompiled patterns / constants for text cleanup (_clean_text_ending, _safe_filename)
+_RE_INCOMPLETE_SENTENCE_END = re.compile(r'[a-zäöüß][,;]?\s+[A-ZÄÖÜ][a-zäöüß]+\.?\s*$')
+_RE_UNSAFE_FILENAME_CHARS = re.compile(r'[^\w\s-]')
+_RE_WHITESPACE = re.compile(r'\s+')
+_RE_NON_WHITESPACE = re.compile(r'\S+') # Word positions for token-budget trimming
+# LLM boilerplate headings in front of chapter summaries / running summary updates
+_RE_SUMMARY_PREFIX = re.compile(r'^(Zusammenfassung|Summary)[:\s]*', re.IGNORECASE | re.MULTILINE)
+_RE_RUNNING_SUMMARY_PREFIX = re.compile(
+    r'^(Aktualisierte Gesamtzusammenfassung|Updated Overall Summary)[:\s]*', re.IGNORECASE | re.MULTILINE
+)
+_RE_TEMPLATE_STATIC_PREFIX = re.compile(r'(?:[^{}]|\{\{|\}\})*') # Prompt template text before its first {field}
+# A phrase of 3-30 words repeated LOOP_MIN_REPEATS times in a row (the caller also checks LOOP_MIN_PHRASE_CHARS)
+_RE_REPEATED_PHRASE = re.compile(rf'(\b(?:\w+\W+){{3,30}}?)\1{{{LOOP_MIN_REPEATS - 1},}}')
+# Outline headings "Kapitel/Chapter N" (group 1 = N) and concluding sections that end the last chapter's segment
+_OUTLINE_CONCLUSION_HEADINGS = "Epilog|Fazit|Conclusion|Summary|Gesamtfazit|Final Thoughts"
+_RE_OUTLINE_HEADING: Dict[str, "re.Pattern[str]"] = {
+    chapter_word: re.compile(
+        rf"^[#\s]*(?:{chapter_word}\s+(\d+)\b|{_OUTLINE_CONCLUSION_HEADINGS})[:\s]*\n?",
+        re.IGNORECASE | re.MULTILINE
+    ) for chapter_word in ("Kapitel", "Chapter")
+}
+# Numbered outline headings "N." / "N:" (group 1 = N), for outlines without chapter-word headings
+_RE_OUTLINE_NUMBERED_HEADING = re.compile(
+    rf"^[#\s]*(?:(\d+)[.:]|{_OUTLINE_CONCLUSION_HEADINGS})[:\s]*\n?", re.IGNORECASE | re.MULTILINE
+)
+_SENTENCE_END_CHARS: Tuple[str, ...] = ('.', '!', '?', '"', "'", '”', '’') # For str.endswith
+# Opening -> closing quote. The ASCII apostrophe is not tracked: it cannot be told apart from "don't"/"it's".
+_MATCHING_QUOTES: Dict[str, str] = {'"': '"', '“': '”', '‘': '’'}
+_CLOSING_QUOTES = frozenset(_MATCHING_QUOTES.values())
+_TYPOGRAPHIC_QUOTES: Tuple[str, ...] = ('“', '”', '‘', '’') # Their presence needs the full stack walk
+
+def _last_paragraph_break(text: str, end: Optional[int] = None) -> int:
+    """Index of the last '\n\n' break before end, placed as text.split('\n\n') would place it (-1 if none)."""
+    cut = text.rfind('\n\n', 0, end)
+    if cut == -1: return -1
+    run_start = cut
+    while run_start > 0 and text[run_start - 1] == '\n': run_start -= 1
+    return run_start + ((cut + 2 - run_start) // 2 - 1) * 2 # split() pairs a newline run from its left end
+
+def _rfind_any(text: str, marks: Tuple[str, ...], end: Optional[int] = None) -> int:
+    """Position of the last occurrence of any of marks before end (-1 if none)."""
+    last = -1
+    for mark in marks: # Each further search only covers the text after the best hit so far
+        last = max(last, text.rfind(mark, last + 1, end))
+    return last
+
+@functools.lru_cache(maxsize=64)
+def _outline_segment_patterns(chapter_word: str, chapter_number: int) -> Tuple["re.Pattern[str]", ...]:
+    """Compiled (start, end, number-only start) patterns of _extract_outline_segment for one chapter."""
+    return (
+        # Optional leading whitespace/markdown, chapter word, number, optional colon/space/newline
+        re.compile(rf"^[#\s]*{chapter_word}\s+{chapter_number}\b[:\s]*\n?", re.IGNORECASE | re.MULTILINE),
+        # Start of the next chapter OR common concluding words (Epilog, Fazit, etc.)
+        re.compile(
+            rf"^[#\s]*(?:(?:{chapter_word}\s+{chapter_number + 1}\b)|(?:{_OUTLINE_CONCLUSION_HEADINGS}))[:\s]*\n?",
+            re.IGNORECASE | re.MULTILINE
+        ),
+        # Just the number followed by a period or colon, e.g., "3." or "3:"
+        re.compile(rf"^[#\s]*{chapter_number}[.:]\s*\n?", re.MULTILINE),
+    )
 
 # --- Module-Level Constants ---
 SUPPORTED_LANGUAGES: List[str] = ["Deutsch", "Englisch"]
 MAX_WORDS_PER_CHAPTER: int = 3000 # Max words per chapter *generation call*
+CACHE_DIR: str = os.path.join(os.path.expanduser("~"), ".cache", "story-gen") # On-disk response cache (--use-cache)
 
-# Logging configuration (will be reconfigured in main based on args)
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Logging is configured in main() (or by the importing application)
 log = logging.getLogger(__name__) # Use standard logger
 
+# Cumulative wall time per phase (seconds) for the --debug breakdown; nested phases overlap
+# (e.g. the summary phases include their own API time)
+_PHASE_TIMES: Dict[str, float] = collections.defaultdict(float)
+_PHASE_TIMES_LOCK = threading.Lock() # Phases are also timed on the background summary thread
+
+def _timed(phase: str) -> Callable:
+    """Decorator: adds the wall time of each call to _PHASE_TIMES[phase]."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with _PHASE_TIMES_LOCK:
+                    _PHASE_TIMES[phase] += elapsed
+        return wrapper
+    return decorator
+
+class _TokenBucket:
+    """Thread-safe token bucket: acquire(n) blocks until n units are available (refilled continuously)."""
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.refill_rate = per_minute / 60.0 # Units per second
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n: float) -> None:
+        if self.capacity <= 0: return # Limit disabled
+        n = min(n, self.capacity) # A single oversized request must not block forever
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.refill_rate)
+            self.last = now
+            self.tokens -= n # Reserve now (may go negative), so waiting callers queue up in order
+            wait_s = -self.tokens / self.refill_rate if self.tokens < 0 else 0.0
+        if wait_s > 0:
+            log.debug("Rate limit: waiting %.1fs before the next API call.", wait_s)
+            time.sleep(wait_s)
+
+# Shared by all StoryGenerator instances and threads in this process
+_rpm_bucket = _TokenBucket(RPM_LIMIT)
+_tpm_bucket = _TokenBucket(TPM_LIMIT)
+
+def set_rate_limits(rpm_limit: int, tpm_limit: int) -> None:
+    """Replaces the process-wide client-side rate limits (per minute, 0 disables)."""
+    global _rpm_bucket, _tpm_bucket
+    _rpm_bucket = _TokenBucket(rpm_limit)
+    _tpm_bucket = _TokenBucket(tpm_limit)
+
 class StoryGenerator: # Renamed class
     """
     Generates short stories with quality guidelines in the prompt.
@@ -97,9 +254,17 @@ Erstelle eine Outline mit **klar voneinander abgegrenzten Abschnitten für jedes
 {zusatz_anweisungen}""",
 
             # --- **FINAL REVISED** Chapter Prompt with Hierarchy ---
-            "PROMPT_CHAPTER_GEN": """Du bist ein talentierter und erfahrener Autor von Kurzgeschichten in **deutscher Sprache**. Deine Aufgabe ist es, **Kapitel {kapitel_nummer} von {kapitel_anzahl}** einer Geschichte herausragend zu schreiben, indem du die bereitgestellten Kontexte **präzise und hierarchisch** nutzt.
+            "PROMPT_CHAPTER_SYSTEM": """Du bist ein talentierter und erfahrener Autor von Kurzgeschichten in **deutscher Sprache**. Deine Aufgabe ist es, die {kapitel_anzahl} Kapitel der Geschichte '{titel}' nacheinander herausragend zu schreiben. Für jedes Kapitel erhältst du Kontexte (Outline-Auszug, laufende Gesamtzusammenfassung, Ende des vorherigen Kapitels), die du **präzise und hierarchisch** nutzt.
 
-**Kontext und Anweisungen für Kapitel {kapitel_nummer}:**
+**Qualitätsrichtlinien für jedes Kapitel:**
+-   Sprache & Stil: Klar, prägnant, ansprechend. **Starke Variation** in Satzlänge, Struktur und Wortwahl. Exzellenter Lesefluss.
+-   **Wiederholungen STRENG VERMEIDEN:** Vermeide nicht nur Phrasen, sondern auch **ähnliche Satzmuster, Beschreibungen und Handlungsmuster**. {zusatz_anweisungen}
+-   Starke Sprache, "Show, Don't Tell", glaubwürdige Dialoge, Atmosphäre, Pacing (gemäß Outline-Auszug).
+-   Formatierung: Beginne mit '## Kapitel [Nummer]: [Passender Titel]' (AUSSER Kapitel 1: Beginne mit '# {titel}\\n\\n## Kapitel 1: [Kapiteltitel]'). Kein Titel am Ende.
+-   Abschluss: Vollständiger, sinnvoller Satz/Absatz.
+""",
+            # Per-chapter part (user message); the system part above stays identical for all chapters of a story
+            "PROMPT_CHAPTER_USER": """**Kontext und Anweisungen für Kapitel {kapitel_nummer} von {kapitel_anzahl}:**
 
 1.  **WAS SOLL PASSIEREN? (Primärer Fokus!)** - Halte dich **strikt** an die Handlungspunkte für **dieses spezifische Kapitel**, wie sie in folgendem Auszug aus der Plot-Outline beschrieben sind:
     --- START OUTLINE-AUSZUG KAPITEL {kapitel_nummer} ---
@@ -117,13 +282,7 @@ Erstelle eine Outline mit **klar voneinander abgegrenzten Abschnitten für jedes
     {zusammenfassung_vorher}
     --- ENDE KONTEXT KAPITEL {prev_kapitel_nummer} ---
 
-**Weitere Qualitätsrichtlinien:**
--   Umfang: ca. {kapitel_wortanzahl} Wörter (mind. {min_kapitel_worte}, max. {max_kapitel_worte}).
--   Sprache & Stil: Klar, prägnant, ansprechend. **Starke Variation** in Satzlänge, Struktur und Wortwahl. Exzellenter Lesefluss.
--   **Wiederholungen STRENG VERMEIDEN:** Vermeide nicht nur Phrasen, sondern auch **ähnliche Satzmuster, Beschreibungen und Handlungsmuster**. {zusatz_anweisungen}
--   Starke Sprache, "Show, Don't Tell", glaubwürdige Dialoge, Atmosphäre, Pacing (gemäß Outline-Segment).
--   Formatierung: Beginne mit '## Kapitel {kapitel_nummer}: [Passender Titel]' (AUSSER Kapitel 1: Beginne mit '# {titel}\\n\\n## Kapitel 1: [Kapiteltitel]'). Kein Titel am Ende.
--   Abschluss: Vollständiger, sinnvoller Satz/Absatz.
+**Umfang:** ca. {kapitel_wortanzahl} Wörter (mind. {min_kapitel_worte}, max. {max_kapitel_worte}).
 
 **Schreibe jetzt Kapitel {kapitel_nummer} gemäß ALLEN Anweisungen:**
 """,
@@ -195,7 +354,6 @@ Aktualisiere die "Bisherige Handlungszusammenfassung" prägnant, indem du die **
             # --- Other texts (ensure all needed keys are present) ---
             "USER_PROMPT_STORY": "Bitte schreibe eine hochwertige Kurzgeschichte basierend auf Titel '{titel}', Prompt und Setting. Ca. {wortanzahl} Wörter.",
             "USER_PROMPT_OUTLINE": "Bitte erstelle eine detaillierte Plot-Outline für eine {kapitel_anzahl}-teilige, qualitativ hochwertige Geschichte mit Titel '{titel}'.",
-            "USER_PROMPT_CHAPTER": "Bitte schreibe Kapitel {kapitel_nummer} der Geschichte '{titel}' herausragend und gemäß allen Qualitätsrichtlinien, insbesondere unter Beachtung der hierarchischen Kontext-Anweisungen.",
             "USER_PROMPT_EPILOG": "Bitte schreibe einen hochwertigen Epilog für die Geschichte '{titel}' unter Berücksichtigung des Kontextes des letzten Kapitels und der Gesamthandlung.",
             "USER_PROMPT_SUMMARY": "Bitte fasse das vorherige Kapitel gemäß den Anweisungen zusammen, um die Kontinuität zu sichern.",
             "USER_PROMPT_RUNNING_SUMMARY": "Bitte aktualisiere die laufende Zusammenfassung der Geschichte mit den Ereignissen aus dem neuesten Kapitel.",
@@ -214,8 +372,6 @@ Aktualisiere die "Bisherige Handlungszusammenfassung" prägnant, indem du die **
             "INFO_SENDING_API_REQUEST": "Sende Anfrage an API (Model: {model}, Max Tokens: {max_tokens}, Temp: {temp:.2f})...",
             "INFO_WAITING_API_RESPONSE": "Warte auf API-Antwort...",
             "INFO_GENERATION_COMPLETE": "Generierung abgeschlossen nach {dauer:.1f} Sekunden.",
-            "INFO_SAVED_TEMP_FILE": "Zwischendaten in temporäre Datei gespeichert: {dateiname}", # Debugging
-            "WARN_CANNOT_WRITE_TEMP": "Warnung: Konnte temporäre Datei nicht schreiben: {error}", # Debugging
             "WARN_CANNOT_DELETE_TEMP": "Warnung: Konnte temporäre Datei nicht löschen: {error}", # Debugging
             "INFO_REMOVED_INCOMPLETE_SENTENCE": "Unvollständiger Satz am Ende entfernt.",
             "INFO_CORRECTING_ENDING": "Textende wird korrigiert...",
@@ -233,7 +389,7 @@ Aktualisiere die "Bisherige Handlungszusammenfassung" prägnant, indem du die **
             "INFO_CHAPTER_COMPLETE": "Kapitel {kapitel_nummer} abgeschlossen ({dauer:.1f}s).",
             "ERROR_API_REQUEST_CHAPTER": "API-Fehler bei Kapitel {kapitel_nummer}: {error}",
             "INFO_RESCUED_PARTIAL_CONTENT": "Teilweise generierter Inhalt ({chars} Zeichen) gerettet.",
-            "ERROR_READING_TEMP_FILE": "Fehler beim Lesen der temporären Datei: {error}", # Debugging
+            "ERROR_RESCUE_FAILED": "Fehler beim Retten des Teiltextes: {error}",
             "INFO_LAST_CHAPTER_INCOMPLETE": "Letztes Kapitel wirkt unvollständig oder wurde gerettet. Generiere Epilog...",
             "INFO_GENERATING_EPILOG": "Generiere Epilog...",
             "INFO_EPILOG_GENERATED": "Epilog generiert ({dauer:.1f}s).",
@@ -243,13 +399,14 @@ Aktualisiere die "Bisherige Handlungszusammenfassung" prägnant, indem du die **
             "ERROR_API_OVERLOAD": "API überlastet/Timeout. Warte {delay:.1f}s, Versuch {retries}/{max_retries}...",
             "ERROR_API_CALL_FAILED": "Fehler während API-Aufruf: {error}",
             "ERROR_ALL_RETRIES_FAILED": "Alle API-Wiederholungen fehlgeschlagen.",
+            "ERROR_CIRCUIT_OPEN": "API nach {fails} fehlgeschlagenen Aufrufen vorübergehend pausiert (noch {wait:.0f}s). Überspringe Aufruf.",
             "ERROR_UNSUPPORTED_LANGUAGE": "Sprache '{sprache}' nicht unterstützt. Unterstützt: {supported}",
             "ERROR_MISSING_API_KEY": "API-Schlüssel erforderlich. NEBIUS_API_KEY setzen oder übergeben.",
             "ERROR_GENERATION_FAILED": "Generierung der Geschichte fehlgeschlagen.",
             "COMMON_NOUN_PREFIXES": ["Der", "Die", "Das", "Ein", "Eine"], # Needed for _extract_char_names (still used internally by summary heuristic)
             "ACTION_VERBS": ["ging", "kam", "sprach", "sah", "fand", "entdeckte", "öffnete", "schloss", "rannte", "floh", "kämpfte", "starb", "tötete", "küsste", "sagte", "antwortete", "erwiderte", "blickte", "dachte"], # Needed for _extract_important_sentences (still used internally by summary heuristic)
             "EMOTIONAL_WORDS": ["angst", "furcht", "freude", "glück", "trauer", "wut", "zorn", "liebe", "hass", "entsetzen", "überraschung", "schock", "verzweiflung", "erleichterung"], # Needed for _extract_important_sentences (still used internally by summary heuristic)
-            "CONJUNCTIONS_AT_END": ['und', 'aber', 'oder', 'denn', 'weil', 'dass', 'ob'],
+            "CONJUNCTIONS_AT_END": frozenset(['und', 'aber', 'oder', 'denn', 'weil', 'dass', 'ob']),
             # --- Context Markers (Adopted from Web Script) ---
             "SUMMARY_LLM_PREFIX": "**Kontext - Zusammenfassung des vorherigen Kapitels (KI-generiert):**",
             "SUMMARY_RAW_END_MARKER_START": "\n\n**--- EXAKTES ENDE DES VORHERIGEN KAPITELS (KONTEXT) ---**",
@@ -306,9 +463,17 @@ Create an outline with **clearly delineated sections for each chapter**:
 {zusatz_anweisungen}""",
 
             # --- **FINAL REVISED** Chapter Prompt with Hierarchy ---
-            "PROMPT_CHAPTER_GEN": """You are a talented and experienced author of short stories in **English**. Your task is to write **Chapter {kapitel_nummer} of {kapitel_anzahl}** of a story exceptionally well, using the provided contexts **precisely and hierarchically**.
+            "PROMPT_CHAPTER_SYSTEM": """You are a talented and experienced author of short stories in **English**. Your task is to write the {kapitel_anzahl} chapters of the story '{titel}' one after another, exceptionally well. For each chapter you receive contexts (outline excerpt, running overall summary, end of the previous chapter) that you use **precisely and hierarchically**.
 
-**Context and Instructions for Chapter {kapitel_nummer}:**
+**Quality Guidelines for Every Chapter:**
+-   Language & Style: Clear, concise, engaging. **Strong variation** in sentence length, structure, and vocabulary. Excellent reading flow.
+-   **STRICTLY AVOID Repetition:** Avoid repeating not just phrases, but also **similar sentence patterns, descriptions, and plot patterns**. {zusatz_anweisungen}
+-   Strong language, "Show, Don't Tell", believable dialogue, atmosphere, pacing (according to the outline excerpt).
+-   Formatting: Start with '## Chapter [Number]: [Appropriate Title]' (Exception for Chapter 1: '# {titel}\\n\\n## Chapter 1: [Chapter Title]'). No title at the end.
+-   Conclusion: Complete, meaningful sentence/paragraph.
+""",
+            # Per-chapter part (user message); the system part above stays identical for all chapters of a story
+            "PROMPT_CHAPTER_USER": """**Context and Instructions for Chapter {kapitel_nummer} of {kapitel_anzahl}:**
 
 1.  **WHAT SHOULD HAPPEN? (Primary Focus!)** - Adhere **strictly** to the plot points for **this specific chapter** as described in the following excerpt from the plot outline:
     --- START OUTLINE EXCERPT CHAPTER {kapitel_nummer} ---
@@ -326,13 +491,7 @@ Create an outline with **clearly delineated sections for each chapter**:
     {zusammenfassung_vorher}
     --- END CONTEXT CHAPTER {prev_kapitel_nummer} ---
 
-**Further Quality Guidelines:**
--   Length: Approx. {kapitel_wortanzahl} words (min {min_kapitel_worte}, max {max_kapitel_worte}).
--   Language & Style: Clear, concise, engaging. **Strong variation** in sentence length, structure, and vocabulary. Excellent reading flow.
--   **STRICTLY AVOID Repetition:** Avoid repeating not just phrases, but also **similar sentence patterns, descriptions, and plot patterns**. {zusatz_anweisungen}
--   Strong language, "Show, Don't Tell", believable dialogue, atmosphere, pacing (according to outline segment).
--   Formatierung: Beginne mit '## Chapter {kapitel_nummer}: [Appropriate Title]' (Exception: '# {titel}\\n\\n## Chapter 1: [Chapter Title]'). No title at the end.
--   Conclusion: Complete, meaningful sentence/paragraph.
+**Length:** Approx. {kapitel_wortanzahl} words (min {min_kapitel_worte}, max {max_kapitel_worte}).
 
 **Write Chapter {kapitel_nummer} now, following ALL instructions:**
 """,
@@ -404,7 +563,6 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             # --- Other texts (ensure all needed keys are present) ---
             "USER_PROMPT_STORY": "Please write a high-quality short story based on title '{titel}', prompt, and setting. Approx. {wortanzahl} words.",
             "USER_PROMPT_OUTLINE": "Please create a detailed plot outline for a {kapitel_anzahl}-chapter, high-quality story titled '{titel}'.",
-            "USER_PROMPT_CHAPTER": "Please write chapter {kapitel_nummer} of the story '{titel}' exceptionally well, following all quality guidelines, especially adhering to the hierarchical context instructions.",
             "USER_PROMPT_EPILOG": "Please write a high-quality epilogue for the story '{titel}', considering the context from the last chapter and the overall plot.",
             "USER_PROMPT_SUMMARY": "Please summarize the previous chapter according to the instructions to ensure continuity.",
             "USER_PROMPT_RUNNING_SUMMARY": "Please update the running story summary with the events from the latest chapter.",
@@ -423,8 +581,6 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             "INFO_SENDING_API_REQUEST": "Sending request to API (Model: {model}, Max Tokens: {max_tokens}, Temp: {temp:.2f})...",
             "INFO_WAITING_API_RESPONSE": "Waiting for API response...",
             "INFO_GENERATION_COMPLETE": "Generation completed in {dauer:.1f} seconds.",
-            "INFO_SAVED_TEMP_FILE": "Intermediate data saved to temporary file: {dateiname}", # Debugging
-            "WARN_CANNOT_WRITE_TEMP": "Warning: Could not write temporary file: {error}", # Debugging
             "WARN_CANNOT_DELETE_TEMP": "Warning: Could not delete temporary file: {error}", # Debugging
             "INFO_REMOVED_INCOMPLETE_SENTENCE": "Removed incomplete sentence at the end.",
             "INFO_CORRECTING_ENDING": "Correcting text ending...",
@@ -442,7 +598,7 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             "INFO_CHAPTER_COMPLETE": "Chapter {kapitel_nummer} completed ({dauer:.1f}s).",
             "ERROR_API_REQUEST_CHAPTER": "API error during chapter {kapitel_nummer}: {error}",
             "INFO_RESCUED_PARTIAL_CONTENT": "Rescued partially generated content ({chars} characters).",
-            "ERROR_READING_TEMP_FILE": "Error reading temporary file: {error}", # Debugging
+            "ERROR_RESCUE_FAILED": "Error rescuing partial text: {error}",
             "INFO_LAST_CHAPTER_INCOMPLETE": "Last chapter seems incomplete or was rescued. Generating epilogue...",
             "INFO_GENERATING_EPILOG": "Generating epilogue...",
             "INFO_EPILOG_GENERATED": "Epilogue generated ({dauer:.1f}s).",
@@ -452,13 +608,14 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             "ERROR_API_OVERLOAD": "API overloaded/timeout. Wait {delay:.1f}s, retry {retries}/{max_retries}...",
             "ERROR_API_CALL_FAILED": "Error during API call: {error}",
             "ERROR_ALL_RETRIES_FAILED": "All API retries failed.",
+            "ERROR_CIRCUIT_OPEN": "API paused after {fails} failed calls ({wait:.0f}s left). Skipping call.",
             "ERROR_UNSUPPORTED_LANGUAGE": "Language '{sprache}' not supported. Supported: {supported}",
             "ERROR_MISSING_API_KEY": "API key required. Set NEBIUS_API_KEY or pass directly.",
             "ERROR_GENERATION_FAILED": "Story generation failed.",
             "COMMON_NOUN_PREFIXES": ["The", "A", "An"], # Needed for _extract_char_names (if used internally)
             "ACTION_VERBS": ["went", "came", "spoke", "said", "answered", "replied", "saw", "found", "discovered", "opened", "closed", "ran", "fled", "fought", "died", "killed", "kissed", "looked", "thought", "realized"], # Needed for _extract_important_sentences (if used internally)
             "EMOTIONAL_WORDS": ["fear", "joy", "happiness", "sadness", "anger", "wrath", "love", "hate", "horror", "surprise", "shock", "despair", "relief"], # Needed for _extract_important_sentences (if used internally)
-            "CONJUNCTIONS_AT_END": ['and', 'but', 'or', 'so', 'yet', 'because', 'if', 'that', 'when', 'while', 'although'],
+            "CONJUNCTIONS_AT_END": frozenset(['and', 'but', 'or', 'so', 'yet', 'because', 'if', 'that', 'when', 'while', 'although']),
              # --- Context Markers (Adopted from Web Script) ---
             "SUMMARY_LLM_PREFIX": "**Context - Summary of the previous chapter (AI-generated):**",
             "SUMMARY_RAW_END_MARKER_START": "\n\n**--- EXACT ENDING OF PREVIOUS CHAPTER (CONTEXT) ---**",
@@ -477,8 +634,18 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
         }
     }
 
-    def __init__(self, api_key: Optional[str] = None, model: str = MODELL_NAME, output_dir: str = "."):
-        """Initializes the StoryGenerator."""
+    def __init__(self, api_key: Optional[str] = None, model: str = MODELL_NAME, output_dir: str = ".",
+                 use_cache: bool = False, http_client: Optional[httpx.Client] = None,
+                 summary_model: Optional[str] = None,
+                 text_callback: Optional[Callable[[str, str], None]] = None):
+        """
+        Initializes the StoryGenerator. With use_cache, identical requests reuse stories from CACHE_DIR.
+        An optional shared http_client lets several generators reuse the same connection pool.
+        summary_model is used for the chapter/running summaries (None: same model as the story).
+        text_callback (if given) receives the story text while it is generated as (label, delta), label being
+        e.g. "Chapter 3". This is a raw preview: an empty delta means the request for label was (re)started
+        and its earlier deltas are void. The finished, cleaned-up chapters come via generate()'s chapter_callback.
+        """
         self.resolved_api_key = api_key or os.environ.get("NEBIUS_API_KEY")
         lang_conf_de = self.LANGUAGE_CONFIG["Deutsch"] # Use German for init errors
         if not self.resolved_api_key:
@@ -488,38 +655,118 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             self.client = OpenAI(
                 base_url=API_BASE_URL,
                 api_key=self.resolved_api_key,
-                timeout=300.0 # Longer timeout for potentially long story generation
+                timeout=300.0, # Longer timeout for potentially long story generation
+                http_client=http_client
             )
         except Exception as e:
             log.error(f"Error initializing OpenAI client: {e}")
             raise
         self.model_name = model
+        self.summary_model_name = summary_model or model
         self.output_dir = output_dir # Store output directory for saving outline
+        self.use_cache = use_cache
+        self.text_callback = text_callback
+        self.last_word_count = 0 # Word count of the most recent generate() result (avoids recounting)
+        self._tokens_per_word: Dict[str, float] = {} # Measured output tokens per word, per language
+        self._stream_usage_supported = True # Cleared if the API rejects stream_options
+        self._consecutive_api_failures = 0 # Circuit breaker state for retry_api_call
+        self._circuit_open_until = 0.0
+        self._circuit_lock = threading.Lock() # Circuit breaker state is shared with the background summary thread
         self.total_steps = 0 # For progress bar
         self.current_step = 0 # For progress bar
 
 
-    def _get_lang_config(self, sprache: str) -> Dict[str, Any]:
-        """Gets the configuration for the specified language ('Deutsch' or 'Englisch')."""
+    @classmethod
+    @functools.lru_cache(maxsize=8)
+    def _get_lang_config(cls, sprache: str) -> Dict[str, Any]:
+        """Gets the configuration for the specified language ('Deutsch' or 'Englisch'). Cached per class and name."""
         lang_lower = sprache.lower()
         if lang_lower in ['deutsch', 'german', 'de']:
             target_lang = "Deutsch"
         elif lang_lower in ['englisch', 'english', 'en']:
             target_lang = "Englisch"
         else:
-            target_lang = sprache if sprache in self.LANGUAGE_CONFIG else None
+            target_lang = sprache if sprache in cls.LANGUAGE_CONFIG else None
 
-        config = self.LANGUAGE_CONFIG.get(target_lang) if target_lang else None
+        config = cls.LANGUAGE_CONFIG.get(target_lang) if target_lang else None
         if not config:
              supported = ", ".join(SUPPORTED_LANGUAGES) # Use module-level constant
-             lang_conf_de = self.LANGUAGE_CONFIG["Deutsch"] # Use German for the error itself
+             lang_conf_de = cls.LANGUAGE_CONFIG["Deutsch"] # Use German for the error itself
              raise ValueError(lang_conf_de["ERROR_UNSUPPORTED_LANGUAGE"].format(sprache=sprache, supported=supported))
         return config
 
+    def _story_cache_path(self, *key_parts: Any) -> str:
+        """Returns the cache file path for a story request (model name is always part of the key)."""
+        key = repr(key_parts + (self.model_name,))
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(CACHE_DIR, "stories", f"{digest}.txt")
+
+    def _response_cache_path(self, params: Dict[str, Any]) -> str:
+        """Returns the cache file path for a single API response (model and all request parameters are the key)."""
+        key = repr((self.model_name, sorted(params.items())))
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(CACHE_DIR, "responses", f"{digest}.txt")
+
+    @staticmethod
+    def _load_cache_file(cache_path: str) -> Optional[str]:
+        """Returns the cached text, or None on a cache miss (missing, empty or unreadable file)."""
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            return text if text.strip() else None
+        except FileNotFoundError:
+            return None # Cache miss
+        except OSError as e:
+            log.warning(f"Ignoring unreadable cache file '{cache_path}': {e}")
+            return None
+
+    @staticmethod
+    def _atomic_write(path: str, text: str, durable: bool = False) -> None:
+        """
+        Writes text to path atomically: temp file in the same directory + os.replace, so a crash never
+        leaves a half-written file. With durable, the data is fsynced before the rename (final outputs only).
+        Raises OSError on failure.
+        """
+        target_dir = os.path.dirname(path) or "."
+        os.makedirs(target_dir, exist_ok=True)
+        # Own temp file with mode 0o666, so the kernel applies the umask like open() does
+        # (NamedTemporaryFile would create a 0600 file)
+        while True:
+            tmp_path = os.path.join(target_dir, f".{os.path.basename(path)}.{os.urandom(4).hex()}.tmp")
+            try:
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+                break
+            except FileExistsError:
+                continue
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+                if durable:
+                    f.flush()
+                    os.fsync(f.fileno())
+            # An existing target keeps its mode
+            try:
+                os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, path) # Readers never see a half-written file
+        except BaseException:
+            try: os.unlink(tmp_path) # No stray *.tmp next to the output
+            except OSError: pass
+            raise
+
+    def _store_cached_story(self, cache_path: str, story: str) -> None:
+        """Writes a story (or API response) to the cache atomically (not fsynced, a lost entry is only a cache miss)."""
+        try:
+            self._atomic_write(cache_path, story)
+            log.debug("Story cached at: %s", cache_path)
+        except OSError as e:
+            log.warning(f"Could not write story cache '{cache_path}': {e}")
+
     def _safe_filename(self, title: str) -> str:
         """Creates a safe filename from a title."""
-        safe_title = re.sub(r'[^\w\s-]', '', title).strip()
-        safe_title = re.sub(r'\s+', '_', safe_title)
+        safe_title = _RE_UNSAFE_FILENAME_CHARS.sub('', title).strip()
+        safe_title = _RE_WHITESPACE.sub('_', safe_title)
         return safe_title[:50]
 
     def show_progress_bar(self):
@@ -531,91 +778,108 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
         arrow = '=' * arrow_length + ('>' if self.current_step < self.total_steps else '=')
         spaces = ' ' * (bar_length - len(arrow))
         percent_display = min(100, int(round(percent * 100)))
-        sys.stdout.write(f"\rProgress: [{arrow}{spaces}] {percent_display}% ({self.current_step}/{self.total_steps})")
-        sys.stdout.flush()
-        if self.current_step >= self.total_steps:
-            sys.stdout.write('\n')
+        line_end = '\n' if self.current_step >= self.total_steps else ''
+        sys.stdout.write(f"\rProgress: [{arrow}{spaces}] {percent_display}% ({self.current_step}/{self.total_steps}){line_end}")
+        sys.stdout.flush() # One write + flush per update (the final newline is flushed too)
 
     def _update_progress(self, step_increment=1):
         """Increments progress step and updates the bar."""
         self.current_step = min(self.current_step + step_increment, self.total_steps)
         self.show_progress_bar()
 
+    @staticmethod
+    def _retry_after_seconds(error: Exception) -> Optional[float]:
+        """Returns the Retry-After delay (seconds) sent with an API error response, if any."""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return None
+        try:
+            return min(max(float(headers.get("retry-after")), 0.0), MAX_RETRY_AFTER_S)
+        except (TypeError, ValueError): # Missing or HTTP-date value: use the normal backoff
+            return None
+
+    @_timed("api_call")
     def retry_api_call(self, call_function, *args, **kwargs):
-        """Executes an API call with automatic retries on overload errors."""
+        """
+        Executes an API call with automatic retries (Retry-After or exponential backoff with jitter)
+        on temporary server errors (RETRYABLE_API_ERRORS). Any other error is raised immediately.
+        After CIRCUIT_BREAKER_FAIL_MAX consecutive failed calls, further calls fail fast
+        for CIRCUIT_BREAKER_RESET_S seconds instead of waiting through all retries again.
+        """
         retries = 0
         lang_conf = self._get_lang_config("Deutsch") # Use German for generic messages
+        with self._circuit_lock:
+            remaining_open_s = self._circuit_open_until - time.monotonic()
+            failures = self._consecutive_api_failures
+        if remaining_open_s > 0:
+            raise RuntimeError(lang_conf["ERROR_CIRCUIT_OPEN"].format(fails=failures, wait=remaining_open_s))
+        # Estimated token cost of the request (prompt + requested output) for the client-side rate limit
+        request_tokens = kwargs.get("max_tokens", 0) + sum(
+            self._estimate_tokens(m.get("content", "")) for m in kwargs.get("messages", ()))
         while retries <= MAX_RETRIES:
             try:
-                return call_function(*args, **kwargs)
-            except Exception as e:
-                # Convert specific OpenAI errors for better matching
-                error_str = str(e).lower()
-                error_type = type(e).__name__
-
-                is_retryable = (
-                    "overloaded" in error_str or
-                    "rate limit" in error_str or
-                    "timeout" in error_str or
-                    "503" in error_str or
-                    "504" in error_str or
-                    "connection error" in error_str or
-                    "service unavailable" in error_str or
-                    isinstance(e, (OpenAI.APITimeoutError, OpenAI.APIConnectionError, OpenAI.RateLimitError, OpenAI.InternalServerError)) # Corrected attribute access
-                )
-
-                if is_retryable and retries < MAX_RETRIES:
+                _rpm_bucket.acquire(1) # Block client-side instead of running into 429 responses
+                _tpm_bucket.acquire(request_tokens)
+                result = call_function(*args, **kwargs)
+                with self._circuit_lock:
+                    self._consecutive_api_failures = 0 # Close the circuit again
+                return result
+            except RETRYABLE_API_ERRORS as e:
+                if retries < MAX_RETRIES:
                     retries += 1
-                    current_retry_delay = (DEFAULT_RETRY_DELAY_S *
-                                           (RETRY_BACKOFF_FACTOR ** (retries - 1)) +
-                                           random.uniform(0.1, 1.0)) # Jitter
+                    current_retry_delay = self._retry_after_seconds(e) # Honor the server's Retry-After header
+                    if current_retry_delay is None:
+                        current_retry_delay = _RETRY_DELAYS[retries - 1] + random.uniform(0.1, 1.0) # Jitter
                     log.warning(lang_conf["ERROR_API_OVERLOAD"].format(
                         delay=current_retry_delay, retries=retries, max_retries=MAX_RETRIES
-                    ) + f" (Type: {error_type})", exc_info=False) # Log error type
+                    ) + f" (Type: {type(e).__name__})", exc_info=False) # Log error type
                     time.sleep(current_retry_delay)
                 else:
-                    # Log the final error with traceback if not retryable or retries exceeded
-                    log.error(lang_conf["ERROR_API_CALL_FAILED"].format(error=str(e)) + f" (Type: {error_type})", exc_info=True)
+                    # API unavailable even after retries: count it for the circuit breaker
+                    with self._circuit_lock:
+                        self._consecutive_api_failures += 1
+                        if self._consecutive_api_failures >= CIRCUIT_BREAKER_FAIL_MAX:
+                            self._circuit_open_until = time.monotonic() + CIRCUIT_BREAKER_RESET_S
+                    log.error(lang_conf["ERROR_API_CALL_FAILED"].format(error=str(e)) + f" (Type: {type(e).__name__})", exc_info=True)
                     raise # Re-raise the original exception
+            except Exception as e:
+                # Not a temporary server issue (e.g. bad request, authentication): fail immediately
+                log.error(lang_conf["ERROR_API_CALL_FAILED"].format(error=str(e)) + f" (Type: {type(e).__name__})", exc_info=True)
+                raise
         # This part should ideally not be reached if the loop always raises on failure
         raise Exception(lang_conf["ERROR_ALL_RETRIES_FAILED"])
 
 
-    def _create_system_prompt(self, sprache: str, template_key: str, context: Dict[str, Any]) -> str:
-        """Creates a system prompt based on language and template."""
-        lang_conf = self._get_lang_config(sprache)
-        template = lang_conf.get(template_key)
-        if not template:
-            raise ValueError(f"Prompt template '{template_key}' not found for language '{sprache}'.")
+    @staticmethod
+    def _canon(text: str) -> str:
+        """Normalizes line endings (CRLF -> LF) and trailing whitespace per line and at the end; other formatting is kept."""
+        return "\n".join(line.rstrip() for line in text.replace("\r\n", "\n").split("\n")).rstrip()
 
-        context['sprache'] = sprache # Ensure language is in context
-        context.setdefault('zusatz_anweisungen', '')
-        # Format additional instructions if provided
-        if context.get('zusatz_anweisungen'): # Check if value is truthy
-             if not context['zusatz_anweisungen'].strip().startswith("**Zusätzliche Anweisungen:**") and \
-                not context['zusatz_anweisungen'].strip().startswith("**Additional Instructions:**"):
-                 prefix = "**Zusätzliche Anweisungen:**" if sprache == "Deutsch" else "**Additional Instructions:**"
-                 context['zusatz_anweisungen'] = f"\n{prefix}\n{context['zusatz_anweisungen'].strip()}\n"
-             else:
-                 context['zusatz_anweisungen'] = f"\n{context['zusatz_anweisungen'].strip()}\n"
-        else:
-             context['zusatz_anweisungen'] = ""
-
-        # Ensure all required keys for the specific template are present or provide defaults
-        required_keys = {
-            "PROMPT_STORY_GEN": ['wortanzahl', 'titel', 'prompt', 'setting'],
-            "PROMPT_OUTLINE_GEN": ['kapitel_anzahl', 'titel', 'prompt', 'setting', 'wortanzahl'],
-            "PROMPT_CHAPTER_GEN": ['kapitel_nummer', 'kapitel_anzahl', 'titel', # Removed 'prompt', 'setting' as they are less critical here now
-                                   'plot_outline_segment', # Uses segment
-                                   'zusammenfassung_vorher', 'running_plot_summary',
-                                   'kapitel_wortanzahl', 'min_kapitel_worte', 'max_kapitel_worte', 'prev_kapitel_nummer'],
-            "PROMPT_EPILOG_GEN": ['titel', 'plot_outline', 'zusammenfassung_vorher', # Epilog uses full outline
-                                  'running_plot_summary', 'letztes_kapitel_ende', 'kapitel_anzahl'],
-            "PROMPT_SUMMARY_GEN": ['kapitel_text'],
-            "PROMPT_RUNNING_SUMMARY_UPDATE": ['bisherige_zusammenfassung', 'neues_kapitel_text', 'kapitel_nummer']
-        }
+    def _chat_completion_text(self, model: Optional[str] = None, **params: Any) -> str:
+        """
+        Runs a chat completion (default: story model) with retries and returns the message text. With use_cache,
+        the response is reused for identical requests, so re-running a failed story skips the finished calls.
+        """
+        params["model"] = model or self.model_name
+        cache_path = self._response_cache_path(params) if self.use_cache else None
+        if cache_path:
+            cached_text = self._load_cache_file(cache_path)
+            if cached_text is not None:
+                log.debug("Using cached API response: %s", cache_path)
+                return cached_text
+        response = self.retry_api_call(self.client.chat.completions.create, **params)
+        text = response.choices[0].message.content
+        if cache_path and text:
+            self._store_cached_story(cache_path, text)
+        return text
 
-        defaults = {
+    @classmethod
+    @functools.lru_cache(maxsize=8)
+    def _prompt_defaults(cls, sprache: str) -> Dict[str, Any]:
+        """Default values for prompt template fields (built once per language; must not be modified)."""
+        lang_conf = cls._get_lang_config(sprache)
+        return {
             'wortanzahl': DEFAULT_TARGET_WORDS,
             'titel': 'Unbenannt' if sprache == "Deutsch" else 'Untitled',
             'prompt': '', 'setting': '', 'kapitel_anzahl': 0, 'kapitel_nummer': 0,
@@ -629,18 +893,50 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             'prev_kapitel_nummer': 0
         }
 
-        # Set defaults for keys required by the current template
-        if template_key in required_keys:
-            for key in required_keys[template_key]:
-                 context.setdefault(key, defaults.get(key))
+    @classmethod
+    @functools.lru_cache(maxsize=32)
+    def _split_template(cls, sprache: str, template_key: str) -> Optional[Tuple[str, str]]:
+        """
+        Splits a prompt template into its static prefix (already rendered, escaped braces resolved) and the
+        remaining template that still has to be formatted. Returns None if the template does not exist.
+        """
+        template = cls._get_lang_config(sprache).get(template_key)
+        if not template:
+            return None
+        split_at = _RE_TEMPLATE_STATIC_PREFIX.match(template).end()
+        return template[:split_at].replace("{{", "{").replace("}}", "}"), template[split_at:]
+
+    @_timed("prompt_build")
+    def _create_system_prompt(self, sprache: str, template_key: str, context: Dict[str, Any]) -> str:
+        """Creates a system prompt based on language and template."""
+        split_template = self._split_template(sprache, template_key)
+        if not split_template:
+            raise ValueError(f"Prompt template '{template_key}' not found for language '{sprache}'.")
+        static_prefix, template = split_template
+
+        # Prompt fields are built in a new mapping, the caller's context stays unchanged.
+        # Canonical line endings/trailing whitespace so identical inputs always give byte-identical prompts (prefix caching)
+        fields = {key: self._canon(value) if isinstance(value, str) else value
+                  for key, value in context.items() if value is not None}
+        fields['sprache'] = sprache # Ensure language is in context
+        # Format additional instructions if provided
+        if fields.get('zusatz_anweisungen'): # Check if value is truthy
+             if not fields['zusatz_anweisungen'].strip().startswith("**Zusätzliche Anweisungen:**") and \
+                not fields['zusatz_anweisungen'].strip().startswith("**Additional Instructions:**"):
+                 prefix = "**Zusätzliche Anweisungen:**" if sprache == "Deutsch" else "**Additional Instructions:**"
+                 fields['zusatz_anweisungen'] = f"\n{prefix}\n{fields['zusatz_anweisungen'].strip()}\n"
+             else:
+                 fields['zusatz_anweisungen'] = f"\n{fields['zusatz_anweisungen'].strip()}\n"
+        else:
+             fields['zusatz_anweisungen'] = ""
 
-        # Use .format_map for safer formatting
+        # Defaults for missing/None fields via a ChainMap (no per-call copying of the defaults)
         try:
-             # Add model name to context for potential use in prompts (optional)
-             context['model_name'] = self.model_name
-             return template.format_map(context)
+             return static_prefix + template.format_map(collections.ChainMap(
+                 fields, {'model_name': self.model_name}, self._prompt_defaults(sprache)
+             ))
         except KeyError as e:
-             log.error(f"Missing key in prompt context for template '{template_key}': {e}. Context: {context}", exc_info=True)
+             log.error(f"Missing key in prompt context for template '{template_key}': {e}. Context: {fields}", exc_info=True)
              raise ValueError(f"Missing context for prompt template '{template_key}': {e}")
 
 
@@ -650,8 +946,7 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
                                ) -> Optional[str]:
         """Generates a shorter story in a single API call with quality focus."""
         lang_conf = self._get_lang_config(sprache)
-        temp_fd, temp_dateiname = tempfile.mkstemp(prefix="temp_story_", suffix=".txt")
-        os.close(temp_fd)
+        rescue_parts: List[str] = [] # Text streamed so far, for rescue on errors
         self._update_progress(0) # Initialize progress for single story
 
         try:
@@ -668,25 +963,18 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             log.info(lang_conf["INFO_WAITING_API_RESPONSE"] + " (Single Story)")
             user_prompt_text = lang_conf["USER_PROMPT_STORY"].format(titel=titel, wortanzahl=word_count)
 
-            response = self.retry_api_call(
-                self.client.chat.completions.create,
-                model=self.model_name, max_tokens=max_tokens, temperature=temperature,
-                messages=[
+            # Streamed: rescue_parts receives the text as it arrives, so a dropped connection can still be rescued
+            story, _ = self._generate_streamed_text(
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt_text},
-                ]
+                ],
+                max_tokens, temperature, rescue_parts, "Story"
             )
-            story = response.choices[0].message.content
             duration = time.time() - start_time
             log.info(lang_conf["INFO_GENERATION_COMPLETE"].format(dauer=duration))
             self._update_progress(1) # Complete progress for single story
 
-            try:
-                with open(temp_dateiname, 'w', encoding='utf-8') as f: f.write(story)
-                log.debug(lang_conf["INFO_SAVED_TEMP_FILE"].format(dateiname=temp_dateiname))
-            except Exception as e:
-                log.warning(lang_conf["WARN_CANNOT_WRITE_TEMP"].format(error=str(e)))
-
             story = self._format_story(story, titel, sprache)
             story = self._clean_text_ending(story, sprache)
             return story
@@ -695,26 +983,20 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             # Ensure progress bar finishes on error
             if self.current_step < self.total_steps: self._update_progress(self.total_steps - self.current_step)
 
-            if not isinstance(e, (OpenAI.APIError, Exception)): # Avoid double logging if retry failed
+            if not isinstance(e, (APIError, httpx.TransportError)): # API errors were already logged by retry_api_call
                 log.error(f"Unexpected error during single story generation for '{titel}': {str(e)}", exc_info=True)
-            # Attempt rescue
-            if os.path.exists(temp_dateiname):
-                try:
-                    with open(temp_dateiname, 'r', encoding='utf-8') as f:
-                        partial_story = f.read()
-                    if len(partial_story) > MIN_CHARS_FOR_RESCUE:
-                        log.info(lang_conf["INFO_RESCUED_PARTIAL_CONTENT"].format(chars=len(partial_story)))
-                        partial_story = self._format_story(partial_story, titel, sprache)
-                        partial_story = self._clean_text_ending(partial_story, sprache)
-                        notice_key = "RESCUED_EPILOG_NOTICE" # Use this key for general incompleteness
-                        return partial_story + f"\n\n{lang_conf.get(notice_key, '[Story generation may be incomplete due to an error.]')}"
-                except Exception as e2:
-                    log.error(lang_conf["ERROR_READING_TEMP_FILE"].format(error=str(e2)))
+            # Attempt rescue of the partially streamed text
+            try:
+                partial_story = "".join(rescue_parts)
+                if len(partial_story) > MIN_CHARS_FOR_RESCUE:
+                    log.info(lang_conf["INFO_RESCUED_PARTIAL_CONTENT"].format(chars=len(partial_story)))
+                    partial_story = self._format_story(partial_story, titel, sprache)
+                    partial_story = self._clean_text_ending(partial_story, sprache)
+                    notice_key = "RESCUED_EPILOG_NOTICE" # Use this key for general incompleteness
+                    return partial_story + f"\n\n{lang_conf.get(notice_key, '[Story generation may be incomplete due to an error.]')}"
+            except Exception as e2:
+                log.error(lang_conf["ERROR_RESCUE_FAILED"].format(error=str(e2)))
             return None
-        finally:
-            if os.path.exists(temp_dateiname):
-                try: os.remove(temp_dateiname)
-                except Exception as e: log.warning(lang_conf["WARN_CANNOT_DELETE_TEMP"].format(error=str(e)))
 
 
     def _format_story(self, story: str, titel: str, sprache: str) -> str:
@@ -722,18 +1004,24 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
         story = story.strip()
         titel_prefix = f"# {titel}" # Markdown H1 format
         if not story.startswith(titel_prefix):
-            lines = story.split('\n')
             # Remove all lines at the beginning starting with #, except the expected title
-            while lines and lines[0].strip().startswith("#") and lines[0].strip() != titel_prefix:
-                log.debug(f"Removing incorrect leading line during format_story: {lines[0]}")
-                lines.pop(0)
-            story = "\n".join(lines).strip()
+            # (only the leading lines are scanned; the story is sliced once instead of split/joined)
+            cursor = 0
+            while cursor < len(story):
+                line_end = story.find('\n', cursor)
+                if line_end == -1: line_end = len(story)
+                line = story[cursor:line_end].strip()
+                if not line.startswith("#") or line == titel_prefix: break
+                log.debug("Removing incorrect leading line during format_story: %s", line)
+                cursor = line_end + 1
+            story = story[cursor:].lstrip()
             # Add the correct title if it's still missing
             if not story.startswith(titel_prefix):
-                 log.debug(f"Prepending main title '{titel_prefix}' during format_story")
+                 log.debug("Prepending main title '%s' during format_story", titel_prefix)
                  story = f"{titel_prefix}\n\n{story}"
         return story
 
+    @_timed("text_cleanup")
     def _clean_text_ending(self, text: str, sprache: str) -> str:
         """Checks and corrects abrupt endings in the text. (Adopted from Web version, generally more robust)"""
         if not text or len(text.strip()) < MIN_CHARS_FOR_RESCUE // 3:
@@ -744,8 +1032,8 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
         text = text.rstrip()
 
         # 1. Incomplete sentence ending (more conservative check)
-        # Looks for patterns like "... word Word." at the very end
-        match = re.search(r'[a-zäöüß][,;]?\s+[A-ZÄÖÜ][a-zäöüß]+\.?\s*$', text)
+        # Looks for patterns like "... word Word." at the very end (only the tail is searched, the pattern is end-anchored)
+        match = _RE_INCOMPLETE_SENTENCE_END.search(text, max(0, len(text) - INCOMPLETE_ENDING_SCAN_CHARS))
         if match:
             # Find last definite sentence end BEFORE the match
             last_sentence_end = -1
@@ -766,12 +1054,12 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
 
 
         # 2. No sentence-ending punctuation and ends with letter/number
-        ends_with_punctuation = any(text.endswith(p) for p in ['.', '!', '?', '"', "'", '”', '’'])
+        ends_with_punctuation = text.endswith(_SENTENCE_END_CHARS)
         last_char_is_alphanum = text[-1].isalnum() if text else False
 
         if not ends_with_punctuation and last_char_is_alphanum:
              # Find the last punctuation mark anywhere before the end
-             last_sentence_end = max(text.rfind('.'), text.rfind('!'), text.rfind('?'), text.rfind('\n\n'))
+             last_sentence_end = _rfind_any(text, ('.', '!', '?', '\n\n'))
              if last_sentence_end > 0:
                  # Truncate after the last found punctuation/paragraph break
                  cutoff_point = last_sentence_end + 1
@@ -791,39 +1079,36 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
 
 
         # 3. Incomplete dialogue quotes (Handles various quote types)
-        paragraphs = text.split('\n\n')
-        last_paragraph = paragraphs[-1].strip() if paragraphs else ""
+        # Only the last paragraph matters, so it is located with rfind instead of splitting the whole text
+        para_cut = _last_paragraph_break(text)
+        last_paragraph = text[para_cut + 2:].strip() if para_cut != -1 else text.strip()
         if last_paragraph:
-            quote_chars = ['"', "'", '“', '”', '‘', '’']
-            matching_quotes = {'"': '"', "'": "'", '“': '”', '‘': '’'}
-            open_quote_stack = []
-
-            for char in last_paragraph:
-                if char in matching_quotes.keys(): # Opening quote
-                    open_quote_stack.append(char)
-                elif char in matching_quotes.values(): # Closing quote
-                    # Check if it matches the last opened quote
-                    if open_quote_stack and char == matching_quotes.get(open_quote_stack[-1]):
+            last_open_quote_char = None
+            if not any(q in last_paragraph for q in _TYPOGRAPHIC_QUOTES):
+                # Common case, ASCII quotes only: an odd number of " means the last one is unclosed
+                if last_paragraph.count('"') % 2: last_open_quote_char = '"'
+            else:
+                open_quote_stack = []
+                for char in last_paragraph:
+                    if open_quote_stack and char == _MATCHING_QUOTES[open_quote_stack[-1]]: # Closes the last opened quote
                         open_quote_stack.pop()
+                    elif char in _MATCHING_QUOTES: # Opening quote
+                        open_quote_stack.append(char)
                     # else: Mismatched closing quote - ignore for ending check
+                if open_quote_stack: last_open_quote_char = open_quote_stack[-1]
 
-            # If stack is not empty, a quote is unclosed
-            if open_quote_stack:
-                last_open_quote_char = open_quote_stack[-1]
+            # A quote is unclosed
+            if last_open_quote_char:
                 # Find the position of the last unclosed opening quote
                 last_open_quote_index = last_paragraph.rfind(last_open_quote_char)
 
                 # Find the last sentence end *within the paragraph* before the unclosed quote
-                last_sentence_end_in_para = max(
-                    last_paragraph.rfind('.', 0, last_open_quote_index),
-                    last_paragraph.rfind('!', 0, last_open_quote_index),
-                    last_paragraph.rfind('?', 0, last_open_quote_index)
-                )
+                last_sentence_end_in_para = _rfind_any(last_paragraph, ('.', '!', '?'), last_open_quote_index)
 
                 # Check if the unclosed quote starts after the last sentence ends
                 if last_open_quote_index > last_sentence_end_in_para:
                     # Cut off after the last complete sentence before the dangling dialogue
-                    text_before_last_para = '\n\n'.join(paragraphs[:-1])
+                    text_before_last_para = text[:para_cut] if para_cut != -1 else ""
                     if text_before_last_para: text_before_last_para += '\n\n'
 
                     cutoff_point_in_para = last_sentence_end_in_para
@@ -841,33 +1126,34 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
 
 
         # 4. Short last paragraph or ending with conjunction
-        paragraphs = text.split('\n\n') # Recalculate in case text changed
-        if len(paragraphs) > 1:
-            last_paragraph_words = paragraphs[-1].strip().split()
+        para_cut = _last_paragraph_break(text) # Recalculate in case text changed
+        if para_cut != -1:
+            last_paragraph_words = text[para_cut + 2:].split()
             # Get language-specific conjunctions
-            conjunctions = lang_conf.get("CONJUNCTIONS_AT_END", [])
+            conjunctions = lang_conf.get("CONJUNCTIONS_AT_END", frozenset())
             ends_with_conj = False
             if last_paragraph_words:
                  last_word_cleaned = last_paragraph_words[-1].lower().strip('".!?,’”)')
                  ends_with_conj = last_word_cleaned in conjunctions
 
             # Check if the *second last* paragraph looks complete
-            second_last_para = paragraphs[-2].strip()
-            second_last_ends_ok = any(second_last_para.endswith(p) for p in ['.','!','?','"','\'','”','’'])
+            prev_cut = _last_paragraph_break(text, para_cut)
+            second_last_para = text[prev_cut + 2 if prev_cut != -1 else 0:para_cut].strip()
+            second_last_ends_ok = second_last_para.endswith(_SENTENCE_END_CHARS)
 
             # Remove last paragraph if it's short/ends with conjunction AND previous looks complete
             if (len(last_paragraph_words) < MIN_WORDS_FOR_VALID_ENDING or ends_with_conj) and second_last_ends_ok:
-                text = '\n\n'.join(paragraphs[:-1]).strip()
+                text = text[:para_cut].strip()
                 log.info(lang_conf["INFO_REMOVED_INCOMPLETE_PARAGRAPH"])
             elif len(last_paragraph_words) < 2 and not second_last_ends_ok:
                  # Also remove very short (0/1 word) last paragraphs if prev is also incomplete
-                 text = '\n\n'.join(paragraphs[:-1]).strip()
+                 text = text[:para_cut].strip()
                  log.info(lang_conf["INFO_REMOVED_INCOMPLETE_PARAGRAPH"] + " (Very short)")
 
         # Log if changes were made
         if text != original_text:
              log.info(f"Text ending cleaned. Length reduced from {len(original_text)} to {len(text)}.")
-             log.debug(f"Cleaned End: ...{text[-80:]}")
+             log.debug("Cleaned End: ...%s", text[-80:])
         return text
 
     def _optimize_chapter_structure(self, word_count: int, max_words_per_chapter: int) -> Tuple[int, List[int]]:
@@ -893,7 +1179,7 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
         # Allow slightly more flexibility (e.g., 1.1x) before forcing recalculation
         max_allowed_flex = max_words_per_chapter * 1.1
         if any(w > max_allowed_flex for w in words_per_chapter):
-            log.debug(f"Recalculating chapter structure as limit {max_words_per_chapter} (~{max_allowed_flex:.0f}) was exceeded.")
+            log.debug("Recalculating chapter structure as limit %s (~%.0f) was exceeded.", max_words_per_chapter, max_allowed_flex)
             num_chapters += 1 # Just add one more chapter
             base_words = word_count // num_chapters
             remainder = word_count % num_chapters
@@ -923,26 +1209,12 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             return None
 
         chapter_word = "Kapitel" if sprache == "Deutsch" else "Chapter"
-
-        # Regex: Optional leading whitespace/markdown, chapter word, number, optional colon/space/newline
-        # Makes the chapter number mandatory \b ensures whole word match
-        start_pattern = re.compile(
-            rf"^[#\s]*{chapter_word}\s+{chapter_number}\b[:\s]*\n?",
-            re.IGNORECASE | re.MULTILINE
-        )
-
-        next_chapter_num = chapter_number + 1
-        # End pattern: Start of the next chapter OR common concluding words (Epilog, Fazit, etc.)
-        # Added more potential end markers
-        end_pattern = re.compile(
-            rf"^[#\s]*(?:(?:{chapter_word}\s+{next_chapter_num}\b)|(?:Epilog|Fazit|Conclusion|Summary|Gesamtfazit|Final Thoughts))[:\s]*\n?",
-            re.IGNORECASE | re.MULTILINE
-        )
+        # Compiled once per chapter number (the chapter number is mandatory, \b ensures whole word match)
+        start_pattern, end_pattern, start_pattern_num_only = _outline_segment_patterns(chapter_word, chapter_number)
 
         start_match = start_pattern.search(plot_outline)
         if not start_match:
             # Fallback: Try finding just the number followed by a period or colon, e.g., "3." or "3:"
-             start_pattern_num_only = re.compile(rf"^[#\s]*{chapter_number}[.:]\s*\n?", re.MULTILINE)
              start_match = start_pattern_num_only.search(plot_outline)
              if not start_match:
                 log.warning(f"Could not find start pattern for Chapter {chapter_number} in outline.")
@@ -961,25 +1233,73 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
              # Try a simple paragraph grab as fallback? Risky. Return None is safer.
              return None
 
-        log.debug(f"Extracted outline segment for Chapter {chapter_number} ({len(segment)} chars)")
+        log.debug("Extracted outline segment for Chapter %s (%s chars)", chapter_number, len(segment))
         return segment
 
 
-    def _generate_chapter_summary_llm(self, chapter_text: str, chapter_number: int, sprache: str) -> Tuple[str, str]:
+    @_timed("outline_segmentation")
+    def _segment_outline(self, plot_outline: str, total_chapters: int, sprache: str) -> Dict[int, str]:
+        """
+        Splits the plot outline into {chapter_number: segment} in a single pass over its chapter headings
+        ("Kapitel/Chapter N", or "N." / "N:" if there are none).
+        Chapters whose heading is not found get the per-chapter fallback search, then a proportional slice
+        of the outline (never the whole outline, which would inflate every chapter prompt).
+        """
+        segments: Dict[int, str] = {}
+        lang_conf = self._get_lang_config(sprache)
+        if not plot_outline or lang_conf.get("ERROR_GENERATING_OUTLINE_FALLBACK", "<ERR>") in plot_outline:
+            return segments
+
+        chapter_word = "Kapitel" if sprache == "Deutsch" else "Chapter"
+        # Numbered headings ("3." / "3:") are only indexed if the outline has no chapter-word headings,
+        # otherwise numbered lists inside a chapter's section would split it
+        for heading_pattern in (_RE_OUTLINE_HEADING[chapter_word], _RE_OUTLINE_NUMBERED_HEADING):
+            headings = list(heading_pattern.finditer(plot_outline))
+            for match, next_match in zip(headings, headings[1:] + [None]):
+                if match.group(1) is None: continue # Concluding section, only marks the end of the previous one
+                segment = plot_outline[match.end():next_match.start() if next_match else len(plot_outline)].strip()
+                if segment: segments.setdefault(int(match.group(1)), segment) # First heading wins
+            if segments: break
+
+        missing = [n for n in range(1, total_chapters + 1) if n not in segments]
+        if missing:
+            log.warning(f"Outline headings missing for chapter(s) {missing}; using fallback segments.")
+            slice_len = math.ceil(len(plot_outline) / total_chapters)
+            for n in missing:
+                segments[n] = (self._extract_outline_segment(plot_outline, n, total_chapters, sprache) or
+                               plot_outline[(n - 1) * slice_len:n * slice_len].strip())
+        log.debug("Segmented outline into %s chapter segments", len(segments))
+        return segments
+
+    @staticmethod
+    def _combine_summary_context(summary_part: str, raw_end_text: str, lang_conf: Dict[str, Any]) -> str:
+        """Joins the chapter summary and (if any) the marked raw chapter end into the next chapter's context."""
+        if not raw_end_text:
+            return summary_part
+        return "".join((summary_part, lang_conf.get("SUMMARY_RAW_END_MARKER_START", ""), "\n",
+                        raw_end_text, "\n", lang_conf.get("SUMMARY_RAW_END_MARKER_END", "")))
+
+    @_timed("chapter_summary")
+    def _generate_chapter_summary_llm(self, chapter_text: str, chapter_number: int, sprache: str) -> Tuple[str, str, Optional[str]]:
         """
         Generates an LLM summary AND extracts the raw end of the chapter.
-        Returns a tuple: (formatted_summary_with_prefix_and_markers, raw_end_text_only)
+        Returns a tuple: (formatted_summary_with_prefix_and_markers, raw_end_text_only, summary_text_or_None)
+        The plain summary text is None if the fallback was used (feeds the running summary).
         """
         lang_conf = self._get_lang_config(sprache)
         log.info(lang_conf["INFO_GENERATING_SUMMARY"].format(kapitel_nummer=chapter_number))
 
         # --- 1. Extract Raw End ---
         raw_end_text_only = ""
+        # Bounds of the stripped chapter text, found without copying the whole chapter
+        first_word = _RE_NON_WHITESPACE.search(chapter_text) if chapter_text else None
+        text_start = first_word.start() if first_word else 0
+        text_end = len(chapter_text) if first_word else 0
+        while text_end > text_start and chapter_text[text_end - 1].isspace(): text_end -= 1
         if chapter_text:
-             chapter_text_stripped = chapter_text.strip()
              chars_for_raw_end = 800 # Target length for raw end context
-             start_index = max(0, len(chapter_text_stripped) - chars_for_raw_end)
-             raw_end_candidate = chapter_text_stripped[start_index:]
+             start_index = max(text_start, text_end - chars_for_raw_end)
+             raw_end_candidate = chapter_text[start_index:text_end]
 
              # Try to start raw end from the beginning of the last paragraph if feasible
              last_para_break = raw_end_candidate.rfind('\n\n')
@@ -994,24 +1314,20 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
                   raw_end_text_only = raw_end_text_only[-(int(chars_for_raw_end * 1.5)):]
 
              raw_end_text_only = raw_end_text_only.strip()
-             log.debug(f"Extracted raw end for chapter {chapter_number} ({len(raw_end_text_only)} chars)")
+             log.debug("Extracted raw end for chapter %s (%s chars)", chapter_number, len(raw_end_text_only))
 
         # --- 2. Generate LLM Summary ---
         # Default fallback in case generation fails
         llm_summary_part = f"{lang_conf['SUMMARY_LLM_PREFIX']}\n{lang_conf['SUMMARY_FALLBACK']}"
 
-        if not chapter_text or len(chapter_text.strip()) < 100:
+        if not chapter_text or text_end - text_start < 100:
             log.warning(f"Chapter {chapter_number} text is too short or missing for LLM summary generation.")
             # Return fallback summary and whatever raw end we got
-            combined_context = llm_summary_part
-            if raw_end_text_only:
-                 raw_end_marker_start = lang_conf.get("SUMMARY_RAW_END_MARKER_START", "")
-                 raw_end_marker_end = lang_conf.get("SUMMARY_RAW_END_MARKER_END", "")
-                 combined_context += f"{raw_end_marker_start}\n{raw_end_text_only}\n{raw_end_marker_end}"
-            return (combined_context, raw_end_text_only)
+            combined_context = self._combine_summary_context(llm_summary_part, raw_end_text_only, lang_conf)
+            return (combined_context, raw_end_text_only, None)
 
         try:
-            max_tokens_summary = 800 # Tokens just for the summary generation call
+            max_tokens_summary = SUMMARY_MAX_TOKENS # Tokens just for the summary generation call
             temperature_summary = 0.55 # Lower temp for factual summary
 
             system_prompt = self._create_system_prompt(
@@ -1019,53 +1335,51 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             )
             user_prompt = lang_conf["USER_PROMPT_SUMMARY"]
 
-            log.info(lang_conf["INFO_SENDING_API_REQUEST"].format(model=self.model_name, max_tokens=max_tokens_summary, temp=temperature_summary) + " (Summary)")
+            log.info(lang_conf["INFO_SENDING_API_REQUEST"].format(model=self.summary_model_name, max_tokens=max_tokens_summary, temp=temperature_summary) + " (Summary)")
             log.info(lang_conf["INFO_WAITING_API_RESPONSE"] + " (Summary)")
 
-            response = self.retry_api_call(
-                self.client.chat.completions.create,
-                model=self.model_name,
+            summary_text = self._chat_completion_text(
+                model=self.summary_model_name,
                 max_tokens=max_tokens_summary,
                 temperature=temperature_summary,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ]
-            )
-            summary_text = response.choices[0].message.content.strip()
+            ).strip()
             # Clean up potential LLM boilerplate
-            summary_text = re.sub(r'^(Zusammenfassung|Summary)[:\s]*', '', summary_text, flags=re.IGNORECASE | re.MULTILINE).strip()
+            summary_text = _RE_SUMMARY_PREFIX.sub('', summary_text).strip()
 
             if not summary_text:
                  log.warning(f"LLM summary for chapter {chapter_number} was empty. Using fallback.")
                  # llm_summary_part remains the fallback defined earlier
+                 summary_text = None
             else:
                  log.info(lang_conf["INFO_SUMMARY_GENERATED"].format(kapitel_nummer=chapter_number))
                  llm_summary_part = f"{lang_conf['SUMMARY_LLM_PREFIX']}\n{summary_text}"
 
             # Combine LLM summary and raw end with markers for the final context string
-            combined_context = llm_summary_part
-            if raw_end_text_only:
-                 raw_end_marker_start = lang_conf.get("SUMMARY_RAW_END_MARKER_START", "")
-                 raw_end_marker_end = lang_conf.get("SUMMARY_RAW_END_MARKER_END", "")
-                 combined_context += f"{raw_end_marker_start}\n{raw_end_text_only}\n{raw_end_marker_end}"
+            combined_context = self._combine_summary_context(llm_summary_part, raw_end_text_only, lang_conf)
 
-            # Return the combined string (for next chapter prompt) and the raw end separately (for epilogue)
-            return (combined_context, raw_end_text_only)
+            # Return the combined string (for next chapter prompt), the raw end separately (for epilogue)
+            # and the plain summary (for the running summary)
+            return (combined_context, raw_end_text_only, summary_text)
 
         except Exception as e:
             log.error(lang_conf["ERROR_GENERATING_SUMMARY"].format(kapitel_nummer=chapter_number, error=str(e)), exc_info=True)
             # Return fallback summary and whatever raw end we got
-            combined_context = llm_summary_part # This is already the fallback
-            if raw_end_text_only:
-                 raw_end_marker_start = lang_conf.get("SUMMARY_RAW_END_MARKER_START", "")
-                 raw_end_marker_end = lang_conf.get("SUMMARY_RAW_END_MARKER_END", "")
-                 combined_context += f"{raw_end_marker_start}\n{raw_end_text_only}\n{raw_end_marker_end}"
-            return (combined_context, raw_end_text_only)
+            # llm_summary_part is already the fallback
+            combined_context = self._combine_summary_context(llm_summary_part, raw_end_text_only, lang_conf)
+            return (combined_context, raw_end_text_only, None)
 
 
-    def _update_running_summary_llm(self, previous_summary: str, new_chapter_text: str, chapter_number: int, sprache: str) -> str:
-        """Updates the running plot summary using the latest chapter."""
+    @_timed("running_summary")
+    def _update_running_summary_llm(self, previous_summary: str, new_chapter_text: str, chapter_number: int, sprache: str,
+                                    compress: bool = False) -> str:
+        """
+        Updates the running plot summary using the latest chapter.
+        With compress=True, new_chapter_text is the newest chapter summary and a shorter result is expected.
+        """
         lang_conf = self._get_lang_config(sprache)
         log.info(lang_conf["INFO_UPDATING_RUNNING_SUMMARY"].format(kapitel_nummer=chapter_number))
 
@@ -1086,9 +1400,7 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             return previous_summary # Return the unmodified previous summary (with placeholder)
 
         try:
-            # Adjust token limit based on estimated size of previous summary + chapter text?
-            # For now, use a generous fixed limit.
-            max_tokens_update = 1500 # Allow ample space for the updated summary
+            max_tokens_update = RUNNING_SUMMARY_MAX_TOKENS # Fixed cap for the updated summary
             temperature_update = 0.6 # Slightly higher temp for integration
 
             system_prompt = self._create_system_prompt(
@@ -1100,22 +1412,20 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             )
             user_prompt = lang_conf["USER_PROMPT_RUNNING_SUMMARY"]
 
-            log.info(lang_conf["INFO_SENDING_API_REQUEST"].format(model=self.model_name, max_tokens=max_tokens_update, temp=temperature_update) + " (Running Summary Update)")
+            log.info(lang_conf["INFO_SENDING_API_REQUEST"].format(model=self.summary_model_name, max_tokens=max_tokens_update, temp=temperature_update) + " (Running Summary Update)")
             log.info(lang_conf["INFO_WAITING_API_RESPONSE"] + " (Running Summary Update)")
 
-            response = self.retry_api_call(
-                self.client.chat.completions.create,
-                model=self.model_name,
+            updated_summary_text = self._chat_completion_text(
+                model=self.summary_model_name,
                 max_tokens=max_tokens_update,
                 temperature=temperature_update,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ]
-            )
-            updated_summary_text = response.choices[0].message.content.strip()
+            ).strip()
             # Clean up potential LLM boilerplate
-            updated_summary_text = re.sub(r'^(Aktualisierte Gesamtzusammenfassung|Updated Overall Summary)[:\s]*', '', updated_summary_text, flags=re.IGNORECASE | re.MULTILINE).strip()
+            updated_summary_text = _RE_RUNNING_SUMMARY_PREFIX.sub('', updated_summary_text).strip()
 
             if not updated_summary_text:
                  log.warning(f"LLM running summary update after chapter {chapter_number} was empty. Reverting to previous summary.")
@@ -1123,7 +1433,7 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             else:
                  log.info(lang_conf["INFO_RUNNING_SUMMARY_UPDATED"])
                  # Basic sanity check on length change
-                 if len(updated_summary_text) < len(current_summary_text) * 0.7 and chapter_number > 1 :
+                 if not compress and len(updated_summary_text) < len(current_summary_text) * 0.7 and chapter_number > 1 :
                       log.warning(f"Running summary update for Ch {chapter_number} significantly shortened the text. Check quality.")
                  # Return the new summary text wrapped in the placeholder
                  return placeholder + updated_summary_text
@@ -1134,22 +1444,44 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             return previous_summary
 
 
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough token count of a text (words * TOKEN_WORD_RATIO)."""
+        return int(len(text.split()) * TOKEN_WORD_RATIO)
+
+    def _compress_summary_stack(self, summary_stack: List[str], chapter_number: int, sprache: str) -> List[str]:
+        """
+        Condenses the per-chapter summaries into a single running summary via PROMPT_RUNNING_SUMMARY_UPDATE
+        (older entries as the previous summary, newest entry as the new content). Keeps the stack on failure.
+        """
+        placeholder = self._get_lang_config(sprache).get("RUNNING_SUMMARY_PLACEHOLDER", "")
+        previous_summary = placeholder + "\n\n".join(summary_stack[:-1])
+        log.debug("Running summary exceeds %s tokens after chapter %s; condensing %s entries.", SUMMARY_TOKEN_BUDGET, chapter_number, len(summary_stack))
+        updated = self._update_running_summary_llm(previous_summary, summary_stack[-1], chapter_number, sprache, compress=True)
+        if updated == previous_summary: # Update failed or was empty: keep the uncondensed entries
+            return summary_stack
+        return [updated[len(placeholder):] if updated.startswith(placeholder) else updated]
+
     def _generate_story_with_chapters(self, prompt: str, setting: str, titel: str,
                                       word_count: int, sprache: str,
                                       additional_instructions: Optional[str],
-                                      max_words_per_chapter: int
+                                      max_words_per_chapter: int,
+                                      chapter_callback: Optional[Callable[[str], None]] = None
                                       ) -> Optional[str]:
-        """Generates a longer story by dividing it into chapters using LLM context and outline segmentation."""
+        """
+        Generates a longer story by dividing it into chapters using LLM context and outline segmentation.
+        If given, chapter_callback is called with each finished chapter text (in order).
+        """
         lang_conf = self._get_lang_config(sprache)
         safe_titel = self._safe_filename(titel)
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 
         num_chapters, words_per_chapter_list = self._optimize_chapter_structure(word_count, max_words_per_chapter)
         log.info(lang_conf["INFO_GENERATING_CHAPTERS"].format(kapitel_anzahl=num_chapters))
-        log.debug(f"Planned word distribution: {words_per_chapter_list}")
+        log.debug("Planned word distribution: %s", words_per_chapter_list)
 
         # --- Setup Progress Bar ---
-        self.total_steps = 1 + num_chapters * 3 + 1 # Outline(1) + N Chapters(N) + N Detail Summaries(N) + N Running Summaries(N) + Epilogue(1)
+        self.total_steps = 1 + num_chapters * 3 + 1 # Outline(1) + N Chapters(N) + N Detail Summaries(N) + N Running Summary updates(N) + Epilogue(1)
         self.current_step = 0
         self._update_progress(0) # Initialize bar
 
@@ -1170,12 +1502,10 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             log.info(lang_conf["INFO_SENDING_API_REQUEST"].format(model=self.model_name, max_tokens=min(8000, MAX_TOKENS_PER_CALL), temp=0.7) + " (Outline)")
             log.info(lang_conf["INFO_WAITING_API_RESPONSE"] + " (Outline)")
             start_time_outline = time.time()
-            outline_response = self.retry_api_call(
-                self.client.chat.completions.create, model=self.model_name,
+            plot_outline = self._chat_completion_text(
                 max_tokens=min(8000, MAX_TOKENS_PER_CALL), temperature=0.7,
                 messages=[ {"role": "system", "content": outline_system_prompt}, {"role": "user", "content": user_prompt_outline} ]
             )
-            plot_outline = outline_response.choices[0].message.content
             log.info(lang_conf["INFO_OUTLINE_CREATED"] + f" ({time.time() - start_time_outline:.1f}s)")
             self._update_progress() # Outline step done
 
@@ -1184,12 +1514,10 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
                 # Save to temp file first (robustness during generation)
                 with open(temp_outline_path, 'w', encoding='utf-8') as f_temp: f_temp.write(plot_outline)
                 log.debug(lang_conf["INFO_SAVED_OUTLINE_TEMP"].format(dateiname=temp_outline_path))
-                # Attempt to save the final outline file
-                os.makedirs(os.path.dirname(outline_final_filename), exist_ok=True)
-                with open(outline_final_filename, 'w', encoding='utf-8') as f_final:
-                     outline_header_key = "Plot Outline for '{titel}'" if sprache == "Englisch" else "Plot-Outline für '{titel}'"
-                     outline_header = f"# {outline_header_key.format(titel=titel)}\n\n"
-                     f_final.write(outline_header + plot_outline)
+                # Attempt to save the final outline file (atomic + fsynced)
+                outline_header_key = "Plot Outline for '{titel}'" if sprache == "Englisch" else "Plot-Outline für '{titel}'"
+                outline_header = f"# {outline_header_key.format(titel=titel)}\n\n"
+                self._atomic_write(outline_final_filename, outline_header + plot_outline, durable=True)
                 log.info(lang_conf["INFO_SAVED_OUTLINE_FINAL"].format(dateiname=outline_final_filename))
                 outline_saved = True
             except Exception as e:
@@ -1207,10 +1535,11 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             plot_outline = f"[{lang_conf.get('ERROR_GENERATING_OUTLINE_FALLBACK', 'Plot outline generation failed')}]"
         finally:
              # Keep temp outline file if final save failed and temp exists, otherwise delete
-             if outline_saved and os.path.exists(temp_outline_path):
-                 try: os.remove(temp_outline_path)
-                 except Exception as e: log.warning(lang_conf["WARN_CANNOT_DELETE_TEMP"].format(error=str(e)))
-             elif not outline_saved and os.path.exists(temp_outline_path):
+             if outline_saved:
+                 try: os.unlink(temp_outline_path)
+                 except FileNotFoundError: pass
+                 except OSError as e: log.warning(lang_conf["WARN_CANNOT_DELETE_TEMP"].format(error=str(e)))
+             elif os.path.exists(temp_outline_path):
                  log.warning(f"Keeping temporary outline file '{temp_outline_path}' as final save failed.")
 
 
@@ -1219,102 +1548,136 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
         # Tuple: (combined_context_for_prompt, raw_end_text_only)
         context_for_next_chapter: Tuple[str, str] = (lang_conf["SUMMARY_FIRST_CHAPTER"], "")
         running_plot_summary: str = lang_conf.get("RUNNING_SUMMARY_PLACEHOLDER","") + lang_conf.get("RUNNING_SUMMARY_INITIAL","")
+        # Running summary = per-chapter summaries (condensed by the LLM only when over SUMMARY_TOKEN_BUDGET)
+        summary_placeholder = lang_conf.get("RUNNING_SUMMARY_PLACEHOLDER", "")
+        summary_stack: List[str] = []
+        # Condensing the summary stack runs in the background while the next chapter is written
+        summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+        pending_compression: Optional[Future] = None
+        compressed_entries = 0 # Number of stack entries the pending condensation covers
+        chapter_word = "Kapitel" if sprache == "Deutsch" else "Chapter"
+        outline_segments = self._segment_outline(plot_outline, num_chapters, sprache) # Once, not per chapter
+        # Static instructions, built once: byte-identical system prompt for every chapter (provider prompt-prefix caching)
+        chapter_system_prompt = self._create_system_prompt(sprache, "PROMPT_CHAPTER_SYSTEM", {
+            "kapitel_anzahl": num_chapters, "titel": titel, "zusatz_anweisungen": additional_instructions
+        })
 
-        for i in range(num_chapters):
-            chapter_number = i + 1
-            target_words_chapter = words_per_chapter_list[i]
-            log.info(lang_conf["INFO_GENERATING_CHAPTER_NUM"].format(kapitel_nummer=chapter_number, kapitel_anzahl=num_chapters))
-
-            # --- A. Prepare Combined Context (Use the combined string directly) ---
-            kombinierter_kontext_prompt, _ = context_for_next_chapter # Unpack, only need combined part
-
-            # --- B. Extract Outline Segment ---
-            current_outline_segment = self._extract_outline_segment(
-                plot_outline, chapter_number, num_chapters, sprache
-            )
-            if not current_outline_segment:
-                 # If segment is missing, use a clear placeholder
-                 log.warning(f"Using placeholder for Chapter {chapter_number} outline segment.")
-                 default_segment = "[Outline Segment nicht verfügbar]" if sprache == "Deutsch" else "[Outline Segment Unavailable]"
-                 current_outline_segment = default_segment
-
-
-            # --- C. Prepare Chapter Generation Context ---
-            prev_chapter_num = chapter_number - 1
-            chapter_context = {
-                "kapitel_nummer": chapter_number, "kapitel_anzahl": num_chapters, "titel": titel,
-                # "prompt": prompt, "setting": setting, # Less critical now with outline focus
-                "plot_outline_segment": current_outline_segment, # Pass segment or placeholder
-                "zusammenfassung_vorher": kombinierter_kontext_prompt, # Combined LLM summary + Raw End
-                "running_plot_summary": running_plot_summary, # Running summary
-                "kapitel_wortanzahl": target_words_chapter,
-                "min_kapitel_worte": int(target_words_chapter * 0.7), # Adjusted min slightly lower
-                "max_kapitel_worte": int(target_words_chapter * 1.6), # Adjusted max slightly higher
-                "zusatz_anweisungen": additional_instructions,
-                "prev_kapitel_nummer": prev_chapter_num,
-            }
-
-            chapter_text = None
-            chapter_generation_failed = False
-            try:
-                # --- D. Generate Chapter ---
-                chapter_text = self._generate_single_chapter_api(
-                    chapter_number, num_chapters, chapter_context, sprache, titel
-                )
-                if chapter_text is None:
-                     # If API call failed and returned None, create error placeholder
-                     log.error(f"Chapter {chapter_number} generation returned None. Creating error placeholder.")
-                     error_title = lang_conf["ERROR_CHAPTER_TITLE"].format(kapitel_nummer=chapter_number)
-                     error_content = lang_conf["ERROR_CHAPTER_CONTENT"]
-                     chapter_text = f"## {error_title}\n\n{error_content}" # Use H2 for error title
-                     if chapter_number == 1: # Add H1 Main Title only for first chapter failure
-                          chapter_text = f"# {titel}\n\n{chapter_text}"
-                     chapter_generation_failed = True # Flag failure
-                     # Do NOT append here, append after context generation block
-
-                self._update_progress() # Chapter gen step done
-
-                # --- E. Generate Detailed Context for NEXT chapter ---
-                is_error_content = lang_conf.get("ERROR_CHAPTER_CONTENT","<ERROR>") in chapter_text
-                is_rescue_notice = lang_conf.get("RESCUED_CHAPTER_NOTICE","<RESCUE>") in chapter_text
-
-                if not is_error_content and not is_rescue_notice:
-                     context_for_next_chapter = self._generate_chapter_summary_llm(chapter_text, chapter_number, sprache)
-                else:
-                     log.warning(f"Skipping detailed context generation after faulty/rescued chapter {chapter_number}.")
-                     fallback_summary = f"{lang_conf['SUMMARY_LLM_PREFIX']}\n{lang_conf['SUMMARY_FALLBACK']}"
-                     context_for_next_chapter = (fallback_summary, "") # Provide fallback, no raw end
-
-                self._update_progress() # Detail summary step done
-
-                # --- F. Update Running Summary ---
-                if not is_error_content and not is_rescue_notice:
-                     running_plot_summary = self._update_running_summary_llm(running_plot_summary, chapter_text, chapter_number, sprache)
-                else:
-                     log.warning(f"Skipping running summary update after faulty/rescued chapter {chapter_number}.")
-                     # Keep previous running_plot_summary
-
-                self._update_progress() # Running summary step done
-
-                # Append the generated (or error placeholder) chapter text now
-                generated_chapters.append(chapter_text)
+        try:
+            for i in range(num_chapters):
+                chapter_number = i + 1
+                target_words_chapter = words_per_chapter_list[i]
+                log.info(lang_conf["INFO_GENERATING_CHAPTER_NUM"].format(kapitel_nummer=chapter_number, kapitel_anzahl=num_chapters))
+
+                # --- A. Prepare Combined Context (Use the combined string directly) ---
+                kombinierter_kontext_prompt, _ = context_for_next_chapter # Unpack, only need combined part
+
+                # --- B. Look up Outline Segment ---
+                current_outline_segment = outline_segments.get(chapter_number)
+                if not current_outline_segment:
+                     # If segment is missing, use a clear placeholder
+                     log.warning(f"Using placeholder for Chapter {chapter_number} outline segment.")
+                     default_segment = "[Outline Segment nicht verfügbar]" if sprache == "Deutsch" else "[Outline Segment Unavailable]"
+                     current_outline_segment = default_segment
+
+
+                # --- C. Prepare Chapter Generation Context (per-chapter user prompt) ---
+                prev_chapter_num = chapter_number - 1
+                chapter_context = {
+                    "kapitel_nummer": chapter_number, "kapitel_anzahl": num_chapters,
+                    # "prompt": prompt, "setting": setting, # Less critical now with outline focus
+                    "plot_outline_segment": current_outline_segment, # Pass segment or placeholder
+                    "zusammenfassung_vorher": kombinierter_kontext_prompt, # Combined LLM summary + Raw End
+                    "running_plot_summary": running_plot_summary, # Running summary
+                    "kapitel_wortanzahl": target_words_chapter,
+                    "min_kapitel_worte": int(target_words_chapter * 0.7), # Adjusted min slightly lower
+                    "max_kapitel_worte": int(target_words_chapter * 1.6), # Adjusted max slightly higher
+                    "prev_kapitel_nummer": prev_chapter_num,
+                }
 
-            except Exception as e:
-                # Catch unexpected errors within the loop for this chapter
-                log.error(f"Critical error during processing of chapter {chapter_number}: {e}", exc_info=True)
-                 # Ensure progress steps for this chapter are marked complete on loop error
-                steps_done_this_loop = (self.current_step - 1) % 3 # Steps after outline
-                steps_remaining_this_loop = 3 - steps_done_this_loop
-                self._update_progress(steps_remaining_this_loop)
-                # Create error placeholder if chapter text wasn't generated
-                if chapter_text is None:
-                     error_title = lang_conf["ERROR_CHAPTER_TITLE"].format(kapitel_nummer=chapter_number)
-                     error_content = lang_conf["ERROR_CHAPTER_CONTENT"]
-                     chapter_text = f"## {error_title}\n\n{error_content}" # Use H2
-                     if chapter_number == 1: chapter_text = f"# {titel}\n\n{chapter_text}"
-                     generated_chapters.append(chapter_text)
-                # Decide whether to continue or abort all generation? For now, continue with error placeholder.
-                # return None # Option to abort entire generation
+                chapter_text = None
+                chapter_generation_failed = False
+                try:
+                    # --- D. Generate Chapter ---
+                    chapter_text = self._generate_single_chapter_api(
+                        chapter_number, num_chapters, chapter_context, sprache, titel, chapter_system_prompt
+                    )
+                    if chapter_text is None:
+                         # If API call failed and returned None, create error placeholder
+                         log.error(f"Chapter {chapter_number} generation returned None. Creating error placeholder.")
+                         error_title = lang_conf["ERROR_CHAPTER_TITLE"].format(kapitel_nummer=chapter_number)
+                         error_content = lang_conf["ERROR_CHAPTER_CONTENT"]
+                         chapter_text = f"## {error_title}\n\n{error_content}" # Use H2 for error title
+                         if chapter_number == 1: # Add H1 Main Title only for first chapter failure
+                              chapter_text = f"# {titel}\n\n{chapter_text}"
+                         chapter_generation_failed = True # Flag failure
+                         # Do NOT append here, append after context generation block
+
+                    self._update_progress() # Chapter gen step done
+
+                    # --- E. Generate Detailed Context for NEXT chapter ---
+                    is_error_content = lang_conf.get("ERROR_CHAPTER_CONTENT","<ERROR>") in chapter_text
+                    is_rescue_notice = lang_conf.get("RESCUED_CHAPTER_NOTICE","<RESCUE>") in chapter_text
+
+                    chapter_summary = None
+                    if not is_error_content and not is_rescue_notice:
+                         kombinierter_kontext, raw_end, chapter_summary = self._generate_chapter_summary_llm(chapter_text, chapter_number, sprache)
+                         context_for_next_chapter = (kombinierter_kontext, raw_end)
+                    else:
+                         log.warning(f"Skipping detailed context generation after faulty/rescued chapter {chapter_number}.")
+                         fallback_summary = f"{lang_conf['SUMMARY_LLM_PREFIX']}\n{lang_conf['SUMMARY_FALLBACK']}"
+                         context_for_next_chapter = (fallback_summary, "") # Provide fallback, no raw end
+
+                    self._update_progress() # Detail summary step done
+
+                    # --- F. Update Running Summary ---
+                    # The chapter summary is appended; the LLM is only asked to condense once the budget is exceeded.
+                    # The condensation is not awaited: the next chapter still gets the full entries, the condensed
+                    # stack is adopted after a later chapter (no condensation after the last chapter).
+                    if chapter_summary:
+                         summary_stack.append(f"{chapter_word} {chapter_number}: {chapter_summary}")
+                         if pending_compression is not None and pending_compression.done():
+                              summary_stack = pending_compression.result() + summary_stack[compressed_entries:]
+                              pending_compression = None
+                         if pending_compression is None and chapter_number < num_chapters and len(summary_stack) > 1 and \
+                            self._estimate_tokens("\n\n".join(summary_stack)) > SUMMARY_TOKEN_BUDGET:
+                              compressed_entries = len(summary_stack)
+                              pending_compression = summary_executor.submit(
+                                  self._compress_summary_stack, list(summary_stack), chapter_number, sprache
+                              )
+                         running_plot_summary = summary_placeholder + "\n\n".join(summary_stack)
+                    else:
+                         log.warning(f"Skipping running summary update after faulty/rescued chapter {chapter_number}.")
+                         # Keep previous running_plot_summary
+
+                    self._update_progress() # Running summary step done
+
+                    # Append the generated (or error placeholder) chapter text now
+                    generated_chapters.append(chapter_text)
+                    if chapter_callback: chapter_callback(chapter_text)
+
+                except Exception as e:
+                    # Catch unexpected errors within the loop for this chapter
+                    log.error(f"Critical error during processing of chapter {chapter_number}: {e}", exc_info=True)
+                     # Ensure progress steps for this chapter are marked complete on loop error
+                    steps_done_this_loop = (self.current_step - 1) % 3 # Steps after outline
+                    steps_remaining_this_loop = 3 - steps_done_this_loop
+                    self._update_progress(steps_remaining_this_loop)
+                    # Create error placeholder if chapter text wasn't generated
+                    if chapter_text is None:
+                         error_title = lang_conf["ERROR_CHAPTER_TITLE"].format(kapitel_nummer=chapter_number)
+                         error_content = lang_conf["ERROR_CHAPTER_CONTENT"]
+                         chapter_text = f"## {error_title}\n\n{error_content}" # Use H2
+                         if chapter_number == 1: chapter_text = f"# {titel}\n\n{chapter_text}"
+                         generated_chapters.append(chapter_text)
+                         if chapter_callback: chapter_callback(chapter_text)
+                    # Decide whether to continue or abort all generation? For now, continue with error placeholder.
+                    # return None # Option to abort entire generation
+
+            if pending_compression is not None: # Condensed summary for the epilogue (usually finished by now)
+                summary_stack = pending_compression.result() + summary_stack[compressed_entries:]
+                running_plot_summary = summary_placeholder + "\n\n".join(summary_stack)
+        finally:
+            summary_executor.shutdown(wait=True, cancel_futures=True) # Also when the chapter loop fails
 
         # --- 3. Join Chapters ---
         full_story = self._join_chapters(generated_chapters, titel, sprache)
@@ -1359,7 +1722,7 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
                 )
                 if epilogue_text:
                     # Append epilogue cleanly, ensuring H2 formatting is likely handled by _generate_epilogue
-                    full_story = full_story.strip() + "\n\n" + epilogue_text.strip()
+                    full_story = "\n\n".join((full_story.rstrip(), epilogue_text.strip())) # Already lstripped by _join_chapters
                     epilogue_generated = True
                 else:
                     log.warning("Epilogue generation failed.")
@@ -1383,47 +1746,202 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
         return full_story
 
 
+    @staticmethod
+    def _keep_last_tokens(text: str, max_tokens: int) -> str:
+        """Returns the end of text with at most ~max_tokens tokens (cut at a word boundary, formatting kept)."""
+        max_words = max(0, int(max_tokens / TOKEN_WORD_RATIO))
+        word_starts = [m.start() for m in _RE_NON_WHITESPACE.finditer(text)]
+        if len(word_starts) <= max_words:
+            return text
+        if max_words == 0:
+            return ""
+        return "..." + text[word_starts[-max_words]:]
+
+    @_timed("prompt_build")
+    def _fit_chapter_prompt(self, sprache: str, chapter_context: Dict[str, Any], system_prompt: str,
+                            max_output_tokens: int, chapter_number: int) -> str:
+        """
+        Builds the PROMPT_CHAPTER_USER text and trims the lowest-priority context blocks until
+        system + user prompt + max_output_tokens fit into MAX_TOKENS_PER_CALL (minus a safety margin):
+        first the running summary (older parts), then the previous chapter context (keeps its end).
+        """
+        chapter_context = dict(chapter_context) # Trimmed blocks must not leak into the caller's context
+        user_prompt = self._create_system_prompt(sprache, "PROMPT_CHAPTER_USER", chapter_context)
+        system_tokens = self._estimate_tokens(system_prompt)
+        input_budget = MAX_TOKENS_PER_CALL - max_output_tokens - PROMPT_TOKEN_SAFETY_MARGIN
+        if input_budget <= system_tokens:
+            # Requested output leaves no room for any context: trimming would only empty all blocks
+            log.warning(f"Chapter {chapter_number}: max_tokens={max_output_tokens} leaves no room for the prompt "
+                        f"within MAX_TOKENS_PER_CALL={MAX_TOKENS_PER_CALL}; sending the prompt untrimmed.")
+            return user_prompt
+        excess = 0
+        for key in ("running_plot_summary", "zusammenfassung_vorher"): # Trim order = priority (lowest first)
+            excess = system_tokens + self._estimate_tokens(user_prompt) - input_budget
+            if excess <= 0:
+                break
+            block = chapter_context.get(key) or ""
+            trimmed = self._keep_last_tokens(block, self._estimate_tokens(block) - excess)
+            log.warning(f"Chapter {chapter_number} prompt exceeds the token budget by ~{excess} tokens; "
+                        f"trimming '{key}' from {len(block)} to {len(trimmed)} chars.")
+            chapter_context[key] = trimmed
+            user_prompt = self._create_system_prompt(sprache, "PROMPT_CHAPTER_USER", chapter_context)
+        else:
+            excess = system_tokens + self._estimate_tokens(user_prompt) - input_budget
+        if excess > 0:
+            log.warning(f"Chapter {chapter_number} prompt still exceeds the token budget by ~{excess} tokens "
+                        f"after trimming the summaries.")
+        return user_prompt
+
+    def _update_tokens_per_word(self, sprache: str, completion_tokens: int, word_count: int) -> None:
+        """Updates the measured tokens-per-word ratio for a language (mean with the previous value, clamped)."""
+        measured = min(max(completion_tokens / word_count, TOKEN_WORD_RATIO_MIN), TOKEN_WORD_RATIO_MAX)
+        previous = self._tokens_per_word.get(sprache)
+        self._tokens_per_word[sprache] = measured if previous is None else (previous + measured) / 2
+        log.info(f"Observed {completion_tokens / word_count:.2f} tokens per word ({sprache}); "
+                 f"using {self._tokens_per_word[sprache]:.2f} for the next chapters.")
+
+    def _stream_completion(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float,
+                           rescue_parts: List[str], label: str, **extra_params: Any) -> Tuple[str, Optional[int], Optional[int]]:
+        """
+        Streams a story/chapter completion. The text received so far is collected in rescue_parts
+        (cleared per attempt), so the caller can rescue a partial response if the stream fails.
+        Each delta is also passed to text_callback (if set), after an empty delta that marks the (re)start.
+        Every STREAM_CHECK_INTERVAL_CHUNKS content chunks the tail is checked for a repeated phrase
+        (see _find_generation_loop); on a loop the stream is closed early and (text, position after the first repetition, None) is returned.
+        Otherwise returns (text, None, completion_tokens) - the token count is None if the server sends no usage.
+        """
+        if self._stream_usage_supported:
+            extra_params["stream_options"] = {"include_usage": True} # Usage chunk for the tokens-per-word ratio
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model_name, max_tokens=max_tokens, temperature=temperature,
+                messages=messages, stream=True, **extra_params
+            )
+        except BadRequestError as e:
+            if "stream_options" not in extra_params or "stream_options" not in str(e): raise
+            log.warning("The API rejected stream_options; streaming without usage reporting from now on.")
+            self._stream_usage_supported = False
+            del extra_params["stream_options"]
+            stream = self.client.chat.completions.create(
+                model=self.model_name, max_tokens=max_tokens, temperature=temperature,
+                messages=messages, stream=True, **extra_params
+            )
+        parts = rescue_parts
+        parts.clear() # A retry starts from scratch
+        text_callback = self.text_callback
+        if text_callback: text_callback(label, "")
+        text_len = 0
+        completion_tokens = None
+        try:
+            for chunk in stream:
+                if getattr(chunk, "usage", None): completion_tokens = chunk.usage.completion_tokens # Final chunk
+                if not chunk.choices: continue
+                delta = chunk.choices[0].delta.content
+                if not delta: continue
+                parts.append(delta)
+                text_len += len(delta)
+                if text_callback: text_callback(label, delta)
+                if len(parts) % STREAM_CHECK_INTERVAL_CHUNKS == 0: # Counts content chunks only
+                    tail = "".join(parts[-STREAM_CHECK_TAIL_CHARS:])[-STREAM_CHECK_TAIL_CHARS:]
+                    loop_pos = self._find_generation_loop(tail)
+                    if loop_pos is not None:
+                        return "".join(parts), text_len - len(tail) + loop_pos, None
+        finally:
+            stream.close() # Stops the server-side generation when returning early
+        return "".join(parts), None, completion_tokens
+
+    @staticmethod
+    def _find_generation_loop(text: str) -> Optional[int]:
+        """
+        Returns the position after the first occurrence of a phrase that repeats LOOP_MIN_REPEATS times in
+        a row and is at least LOOP_MIN_PHRASE_CHARS long, or None. Short repetitions ("Tick tock. Tick tock.")
+        are ordinary prose and don't count.
+        """
+        for match in _RE_REPEATED_PHRASE.finditer(text):
+            if len(match.group(1)) >= LOOP_MIN_PHRASE_CHARS:
+                return match.start() + len(match.group(1))
+        return None
+
+    def _generate_streamed_text(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float,
+                                rescue_parts: List[str], label: str) -> Tuple[str, Optional[int]]:
+        """
+        Generates story text via _stream_completion (reused from the response cache with use_cache).
+        A generation stuck in a repetition loop is re-issued once with a frequency penalty; if that
+        loops as well, its text is kept as received (with a warning). Returns (text, completion_tokens or None).
+        """
+        cache_path = self._response_cache_path(
+            {"messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+        ) if self.use_cache else None
+        cached_text = self._load_cache_file(cache_path) if cache_path else None
+        if cached_text is not None:
+            log.debug("Using cached response for %s: %s", label, cache_path)
+            if self.text_callback:
+                self.text_callback(label, "")
+                self.text_callback(label, cached_text)
+            return cached_text, None
+
+        text, loop_pos, completion_tokens = self.retry_api_call(
+            self._stream_completion, messages=messages, max_tokens=max_tokens,
+            temperature=temperature, rescue_parts=rescue_parts, label=label
+        )
+        if loop_pos is None:
+            if cache_path and text:
+                self._store_cached_story(cache_path, text)
+            return text, completion_tokens
+
+        # Aborted in a repetition loop: re-issue once with a frequency penalty
+        log.warning(f"{label} got stuck repeating a phrase after {loop_pos} chars; "
+                    f"retrying with frequency_penalty={REPETITION_FREQUENCY_PENALTY}.")
+        text, loop_pos, completion_tokens = self.retry_api_call(
+            self._stream_completion, messages=messages, max_tokens=max_tokens,
+            temperature=temperature, rescue_parts=rescue_parts, label=label,
+            frequency_penalty=REPETITION_FREQUENCY_PENALTY
+        )
+        if loop_pos is not None:
+            log.warning(f"{label} is still repeating a phrase after {loop_pos} chars with the frequency penalty; "
+                        f"keeping the text as received ({len(text)} chars).")
+        return text, completion_tokens
+
     def _generate_single_chapter_api(self, chapter_number: int, total_chapters: int,
                                      chapter_context: Dict[str, Any],
-                                     sprache: str, titel: str
+                                     sprache: str, titel: str,
+                                     system_prompt: str
                                      ) -> Optional[str]:
-        """Generates a single chapter via the API with quality focus and hierarchical context."""
+        """
+        Generates a single chapter via the API with quality focus and hierarchical context.
+        system_prompt is the story-wide PROMPT_CHAPTER_SYSTEM text; the chapter context goes into the user message.
+        """
         lang_conf = self._get_lang_config(sprache)
-        temp_chapter_fd, temp_chapter_path = tempfile.mkstemp(suffix=".txt", prefix=f"chapter_{chapter_number}_")
-        os.close(temp_chapter_fd)
+        rescue_parts: List[str] = [] # Text streamed so far, for rescue on errors
 
         try:
             target_words = chapter_context["kapitel_wortanzahl"]
             # Slightly increased token buffer for complex hierarchical prompt
-            max_tokens = min(int(target_words * TOKEN_WORD_RATIO * 1.4) + 600, MAX_TOKENS_PER_CALL)
+            # Tokens per word measured on earlier chapters (TOKEN_WORD_RATIO until the first one is done)
+            tokens_per_word = self._tokens_per_word.get(sprache, TOKEN_WORD_RATIO)
+            max_tokens = min(int(target_words * tokens_per_word * 1.4) + 600, MAX_TOKENS_PER_CALL)
             temperature = 0.75 # Keep temperature moderate
 
-            # Create system prompt using the full context dictionary (includes segment, summaries etc.)
-            system_prompt = self._create_system_prompt(sprache, "PROMPT_CHAPTER_GEN", chapter_context)
-            user_prompt = lang_conf["USER_PROMPT_CHAPTER"].format(kapitel_nummer=chapter_number, titel=titel)
+            # Per-chapter user prompt (segment, summaries etc.) after the shared system prompt,
+            # trimmed if input + requested output would exceed MAX_TOKENS_PER_CALL
+            user_prompt = self._fit_chapter_prompt(sprache, chapter_context, system_prompt, max_tokens, chapter_number)
 
             log.info(lang_conf["INFO_SENDING_API_REQUEST"].format(model=self.model_name, max_tokens=max_tokens, temp=temperature) + f" (Chapter {chapter_number})")
             log.info(lang_conf["INFO_WAITING_API_RESPONSE"] + f" (Chapter {chapter_number})")
             start_time = time.time()
 
-            response = self.retry_api_call(
-                self.client.chat.completions.create,
-                model=self.model_name, max_tokens=max_tokens, temperature=temperature,
-                messages=[ {"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt} ]
+            messages = [ {"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt} ]
+            chapter_text, completion_tokens = self._generate_streamed_text(
+                messages, max_tokens, temperature, rescue_parts, f"Chapter {chapter_number}"
             )
 
-            chapter_text = response.choices[0].message.content
             duration = time.time() - start_time
             log.info(lang_conf["INFO_CHAPTER_COMPLETE"].format(kapitel_nummer=chapter_number, dauer=duration))
 
-            # Save temporarily for potential rescue
-            try:
-                with open(temp_chapter_path, 'w', encoding='utf-8') as f: f.write(chapter_text)
-                log.debug(lang_conf["INFO_SAVED_TEMP_FILE"].format(dateiname=temp_chapter_path))
-            except Exception as e: log.warning(lang_conf["WARN_CANNOT_WRITE_TEMP"].format(error=str(e)))
-
             # Basic validation (word count check)
             word_c = len(chapter_text.split())
+            if completion_tokens and word_c >= MIN_WORDS_FOR_TOKEN_RATIO:
+                self._update_tokens_per_word(sprache, completion_tokens, word_c)
             min_target = chapter_context.get("min_kapitel_worte", 50)
             max_target = chapter_context.get("max_kapitel_worte", target_words * 2) # Wider tolerance
             if word_c < min_target * 0.5: # Check if significantly shorter than min
@@ -1437,35 +1955,29 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             return chapter_text
 
         except Exception as e:
-            # Log API errors specifically if they haven't been logged by retry_api_call already
-            if not isinstance(e, (OpenAI.APIError, Exception)) or "All API retries failed" not in str(e):
+            # Log unexpected errors with a trace (API errors were already logged by retry_api_call)
+            if not isinstance(e, (APIError, httpx.TransportError)):
                  log.error(f"Unexpected error processing chapter {chapter_number} after API call: {e}", exc_info=True)
             # Log the general chapter error message
             log.error(lang_conf["ERROR_API_REQUEST_CHAPTER"].format(kapitel_nummer=chapter_number, error=str(e)), exc_info=False) # Don't need full trace here usually
 
-            # Attempt rescue from temp file
-            if os.path.exists(temp_chapter_path):
-                try:
-                    with open(temp_chapter_path, 'r', encoding='utf-8') as f:
-                        partial_chapter = f.read()
-                    if len(partial_chapter.strip()) > MIN_CHARS_FOR_RESCUE:
-                        log.info(lang_conf["INFO_RESCUED_PARTIAL_CONTENT"].format(chars=len(partial_chapter)))
-                        partial_chapter = self._format_chapter(chapter_number, partial_chapter, titel, sprache)
-                        partial_chapter = self._clean_text_ending(partial_chapter, sprache)
-                        # Append the rescue notice
-                        return partial_chapter + f"\n\n{lang_conf['RESCUED_CHAPTER_NOTICE']}"
-                except Exception as e2:
-                    log.error(lang_conf["ERROR_READING_TEMP_FILE"].format(error=str(e2)))
-
-            # If rescue fails or temp file not useful, return None to signal failure
+            # Attempt rescue of the partially streamed text
+            try:
+                partial_chapter = "".join(rescue_parts)
+                if len(partial_chapter.strip()) > MIN_CHARS_FOR_RESCUE:
+                    log.info(lang_conf["INFO_RESCUED_PARTIAL_CONTENT"].format(chars=len(partial_chapter)))
+                    partial_chapter = self._format_chapter(chapter_number, partial_chapter, titel, sprache)
+                    partial_chapter = self._clean_text_ending(partial_chapter, sprache)
+                    # Append the rescue notice
+                    return partial_chapter + f"\n\n{lang_conf['RESCUED_CHAPTER_NOTICE']}"
+            except Exception as e2:
+                log.error(lang_conf["ERROR_RESCUE_FAILED"].format(error=str(e2)))
+
+            # If rescue fails or the partial text is not useful, return None to signal failure
             return None
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_chapter_path):
-                try: os.remove(temp_chapter_path)
-                except Exception as e: log.warning(lang_conf["WARN_CANNOT_DELETE_TEMP"].format(error=str(e)))
 
 
+    @_timed("text_cleanup")
     def _format_chapter(self, chapter_number: int, chapter_text: str, titel: str, sprache: str) -> str:
         """Ensures the chapter is correctly formatted with H1 Title (Ch1) and H2 Chapters."""
         lang_conf = self._get_lang_config(sprache)
@@ -1498,9 +2010,9 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             if not lines or not lines[0].strip().startswith(main_title_prefix):
                  # Remove any incorrect leading headings
                  while lines and lines[0].strip().startswith("#"):
-                      log.debug(f"Ch1 Format: Removing incorrect leading heading: '{lines[0].strip()}'")
+                      log.debug("Ch1 Format: Removing incorrect leading heading: '%s'", lines[0].strip())
                       lines.pop(0)
-                 log.debug(f"Ch1 Format: Prepending main title (H1): '{main_title_prefix}'")
+                 log.debug("Ch1 Format: Prepending main title (H1): '%s'", main_title_prefix)
                  lines.insert(0, main_title_prefix)
                  # Ensure a blank line after H1 if content follows immediately
                  if len(lines) > 1 and lines[1].strip():
@@ -1508,7 +2020,7 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             # If main title exists, ensure it's exactly H1
             elif lines[0].strip() != main_title_prefix:
                  if re.match(r"^#+\s*" + re.escape(titel), lines[0].strip()):
-                      log.debug(f"Ch1 Format: Correcting main title heading level to H1.")
+                      log.debug("Ch1 Format: Correcting main title heading level to H1.")
                       lines[0] = main_title_prefix
                  # else: some other text, leave it for now
 
@@ -1540,14 +2052,14 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
 
                      # Update the line if it's not exactly the correct H2 format
                      if heading_text != correct_ch1_heading:
-                          log.debug(f"Ch1 Format: Correcting existing Ch1 heading to: '{correct_ch1_heading}'")
+                          log.debug("Ch1 Format: Correcting existing Ch1 heading to: '%s'", correct_ch1_heading)
                           lines[content_start_index] = correct_ch1_heading
                  # else: it's content, not a Ch1 heading
 
             # If no Ch1 heading was found after H1
             if not has_ch1_heading:
                  correct_ch1_heading = first_chapter_heading_correct_prefix # Use default H2
-                 log.debug(f"Ch1 Format: Adding default Chapter 1 heading (H2): '{correct_ch1_heading}'")
+                 log.debug("Ch1 Format: Adding default Chapter 1 heading (H2): '%s'", correct_ch1_heading)
                  lines.insert(content_start_index, correct_ch1_heading)
                  # Ensure blank line after added heading if content follows immediately
                  if len(lines) > content_start_index + 1 and lines[content_start_index+1].strip():
@@ -1574,17 +2086,17 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
 
                      # Update if not exactly correct H2 format
                      if heading_text != correct_heading:
-                          log.debug(f"Ch{chapter_number} Format: Correcting existing heading to: '{correct_heading}'")
+                          log.debug("Ch%s Format: Correcting existing heading to: '%s'", chapter_number, correct_heading)
                           lines[0] = correct_heading
                  # else: first line is content, heading is missing
 
             # If no correct heading found at the start
             if not has_correct_heading:
                  correct_heading = chapter_heading_correct_prefix # Use default H2
-                 log.debug(f"Ch{chapter_number} Format: Adding default heading (H2): '{correct_heading}'")
+                 log.debug("Ch%s Format: Adding default heading (H2): '%s'", chapter_number, correct_heading)
                  # Remove incorrect heading if present
                  if lines and lines[0].strip().startswith("#"):
-                      log.debug(f"Ch{chapter_number} Format: Removing incorrect leading heading: '{lines[0].strip()}'")
+                      log.debug("Ch%s Format: Removing incorrect leading heading: '%s'", chapter_number, lines[0].strip())
                       lines.pop(0)
                  lines.insert(0, correct_heading)
                  # Ensure blank line after added heading
@@ -1600,14 +2112,9 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             log.error(f"Error: No chapter texts provided to join for '{titel}'.")
             return None # Return None to indicate failure
 
-        # First chapter should already have H1 title and H2 chapter heading
-        full_story = chapter_texts[0].strip()
-
-        # Append the rest, ensuring double newline separation
-        for i in range(1, len(chapter_texts)):
-            full_story += "\n\n" + chapter_texts[i].strip()
-
-        return full_story
+        # First chapter should already have H1 title and H2 chapter heading;
+        # single join with double newline separation (no repeated concatenation)
+        return "\n\n".join(chapter_text.strip() for chapter_text in chapter_texts)
 
 
     def _generate_epilogue(self, titel: str, plot_outline: str, combined_context_last_chapter: str,
@@ -1619,8 +2126,7 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
                            ) -> Optional[str]:
         """Generates an epilogue using combined context, running summary, and raw end snippet."""
         lang_conf = self._get_lang_config(sprache)
-        temp_epilogue_fd, temp_epilogue_path = tempfile.mkstemp(suffix=".txt", prefix="epilogue_")
-        os.close(temp_epilogue_fd)
+        rescue_parts: List[str] = [] # Text streamed so far, for rescue on errors
 
         log.info(lang_conf["INFO_GENERATING_EPILOG"])
         try:
@@ -1642,23 +2148,13 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             log.info(lang_conf["INFO_WAITING_API_RESPONSE"] + " (Epilogue)")
             start_time = time.time()
 
-            response = self.retry_api_call(
-                self.client.chat.completions.create,
-                model=self.model_name,
-                max_tokens=max_tokens_epilogue,
-                temperature=0.7, # Keep temperature moderate for conclusion
-                messages=[ {"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt} ]
+            epilogue_text, _ = self._generate_streamed_text(
+                [ {"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt} ],
+                max_tokens_epilogue, 0.7, rescue_parts, "Epilogue" # Keep temperature moderate for conclusion
             )
-            epilogue_text = response.choices[0].message.content
             duration = time.time() - start_time
             log.info(lang_conf["INFO_EPILOG_GENERATED"].format(dauer=duration))
 
-            # Save temp file for potential rescue
-            try:
-                with open(temp_epilogue_path, 'w', encoding='utf-8') as f: f.write(epilogue_text)
-                log.debug(lang_conf["INFO_SAVED_TEMP_FILE"].format(dateiname=temp_epilogue_path))
-            except Exception as e: log.warning(lang_conf["WARN_CANNOT_WRITE_TEMP"].format(error=str(e)))
-
             # Format and clean (ensure H2 heading for Epilogue)
             epilogue_text = epilogue_text.strip()
             epilog_title_base = lang_conf.get('EPILOG_TITLE', 'Epilog' if sprache == 'Deutsch' else 'Epilogue')
@@ -1668,10 +2164,10 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
                  lines = epilogue_text.split('\n')
                  # Remove any incorrect leading headings
                  while lines and lines[0].strip().startswith('#'):
-                      log.debug(f"Epilogue Format: Removing incorrect leading line: {lines[0].strip()}")
+                      log.debug("Epilogue Format: Removing incorrect leading line: %s", lines[0].strip())
                       lines.pop(0)
                  epilogue_text = "\n".join(lines).strip()
-                 log.debug(f"Epilogue Format: Prepending heading '{epilogue_title_correct}'")
+                 log.debug("Epilogue Format: Prepending heading '%s'", epilogue_title_correct)
                  epilogue_text = f"{epilogue_title_correct}\n\n{epilogue_text}"
             else: # Starts with ##, verify/correct the title text
                  lines = epilogue_text.split('\n')
@@ -1690,7 +2186,7 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
                       correct_heading = epilogue_title_correct
 
                  if heading_text != correct_heading:
-                      log.debug(f"Epilogue Format: Correcting heading to '{correct_heading}'")
+                      log.debug("Epilogue Format: Correcting heading to '%s'", correct_heading)
                       lines[0] = correct_heading
                  epilogue_text = "\n".join(lines)
 
@@ -1698,35 +2194,28 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
             return epilogue_text
 
         except Exception as e:
-             # Log API errors specifically if not already logged by retry
-             if not isinstance(e, (OpenAI.APIError, Exception)) or "All API retries failed" not in str(e):
+             # Log unexpected errors with a trace (API errors were already logged by retry_api_call)
+             if not isinstance(e, (APIError, httpx.TransportError)):
                   log.error(f"Unexpected error during epilogue generation: {e}", exc_info=True)
              log.error(lang_conf["ERROR_GENERATING_EPILOG"].format(error=str(e)), exc_info=False)
 
-             # Attempt rescue from temp file
-             if os.path.exists(temp_epilogue_path):
-                 try:
-                     with open(temp_epilogue_path, 'r', encoding='utf-8') as f:
-                         partial_epilogue = f.read()
-                     if len(partial_epilogue.strip()) > MIN_CHARS_FOR_RESCUE:
-                         log.info(lang_conf["INFO_RESCUED_PARTIAL_CONTENT"].format(chars=len(partial_epilogue)))
-                         partial_epilogue = self._clean_text_ending(partial_epilogue.strip(), sprache)
-                         # Format the rescued part with H2 title
-                         epilog_title_base = lang_conf.get('EPILOG_TITLE', 'Epilog' if sprache == 'Deutsch' else 'Epilogue')
-                         epilogue_title_correct = f"## {epilog_title_base}"
-                         if not partial_epilogue.startswith(epilogue_title_correct):
-                              partial_epilogue = f"{epilogue_title_correct}\n\n{partial_epilogue}"
-                         # Add the rescue notice
-                         return partial_epilogue + f"\n\n{lang_conf['RESCUED_EPILOG_NOTICE']}"
-                 except Exception as e2:
-                     log.error(lang_conf["ERROR_READING_TEMP_FILE"].format(error=str(e2)))
+             # Attempt rescue of the partially streamed text
+             try:
+                 partial_epilogue = "".join(rescue_parts)
+                 if len(partial_epilogue.strip()) > MIN_CHARS_FOR_RESCUE:
+                     log.info(lang_conf["INFO_RESCUED_PARTIAL_CONTENT"].format(chars=len(partial_epilogue)))
+                     partial_epilogue = self._clean_text_ending(partial_epilogue.strip(), sprache)
+                     # Format the rescued part with H2 title
+                     epilog_title_base = lang_conf.get('EPILOG_TITLE', 'Epilog' if sprache == 'Deutsch' else 'Epilogue')
+                     epilogue_title_correct = f"## {epilog_title_base}"
+                     if not partial_epilogue.startswith(epilogue_title_correct):
+                          partial_epilogue = f"{epilogue_title_correct}\n\n{partial_epilogue}"
+                     # Add the rescue notice
+                     return partial_epilogue + f"\n\n{lang_conf['RESCUED_EPILOG_NOTICE']}"
+             except Exception as e2:
+                 log.error(lang_conf["ERROR_RESCUE_FAILED"].format(error=str(e2)))
              # Return None if epilogue generation failed and rescue didn't work
              return None
-        finally:
-            # Delete temporary epilogue file
-            if os.path.exists(temp_epilogue_path):
-                try: os.remove(temp_epilogue_path)
-                except Exception as e: log.warning(lang_conf["WARN_CANNOT_DELETE_TEMP"].format(error=str(e)))
 
 
     # --- Main Generate Method (Entry Point) ---
@@ -1735,20 +2224,35 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
                  sprache: str = "Deutsch",
                  additional_instructions: Optional[str] = None,
                  chapter_mode: bool = True,
-                 max_words_per_chapter: int = MAX_WORDS_PER_CHAPTER
+                 max_words_per_chapter: int = MAX_WORDS_PER_CHAPTER,
+                 chapter_callback: Optional[Callable[[str], None]] = None
                  ) -> Optional[str]:
         """
         Main method: Generates a story, deciding on chapter mode based on word count.
         Uses enhanced LLM-based context passing (detailed + running) between chapters if applicable.
         Returns the story as a string or None on failure. CLI version integrates progress bar.
+        In chapter mode, chapter_callback (if given) receives each chapter as soon as it is finished.
         """
         start_time_total = time.time()
+        with _PHASE_TIMES_LOCK:
+            phase_times_before = dict(_PHASE_TIMES) # This run's breakdown = difference at the end
         try:
             lang_conf = self._get_lang_config(sprache)
         except ValueError as e:
             log.error(f"Configuration error: {e}")
             return None # Cannot proceed without valid language config
 
+        cache_path = None
+        if self.use_cache:
+            cache_path = self._story_cache_path(prompt, setting, titel, word_count,
+                                                lang_conf["PROMPT_CHAPTER_SYSTEM"], lang_conf["PROMPT_CHAPTER_USER"],
+                                                additional_instructions, chapter_mode, max_words_per_chapter)
+            cached_story = self._load_cache_file(cache_path)
+            if cached_story is not None:
+                log.info(f"Loaded story from cache: {cache_path}")
+                self.last_word_count = len(cached_story.split())
+                return cached_story
+
         # Use buffer factor primarily for deciding chapter mode
         target_word_count_with_buffer = int(word_count * WORD_COUNT_BUFFER_FACTOR)
         log.info(f"Requested word count: {word_count}, Target with {WORD_COUNT_BUFFER_FACTOR:.1f}x buffer: {target_word_count_with_buffer}")
@@ -1785,7 +2289,7 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
                  log.info(lang_conf["INFO_CHAPTER_MODE_ACTIVATED"].format(wortanzahl=target_word_count_with_buffer))
                  story = self._generate_story_with_chapters(
                      prompt, setting, titel, target_word_count_with_buffer, sprache,
-                     additional_instructions, max_words_per_chapter
+                     additional_instructions, max_words_per_chapter, chapter_callback
                  )
             else:
                 # Double-check feasibility before attempting single call
@@ -1808,8 +2312,17 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
                 return None
 
             actual_word_count = len(story.split())
+            self.last_word_count = actual_word_count
             total_duration = time.time() - start_time_total
             log.info(lang_conf["INFO_FINAL_WORD_COUNT"].format(wortanzahl=actual_word_count) + f" (Total time: {total_duration:.1f}s)")
+            if log.isEnabledFor(logging.DEBUG):
+                with _PHASE_TIMES_LOCK:
+                    phase_times = sorted(_PHASE_TIMES.items())
+                log.debug("Phase breakdown (s, nested phases overlap): %s", ", ".join(
+                    f"{phase}={seconds - phase_times_before.get(phase, 0.0):.2f}"
+                    for phase, seconds in phase_times))
+            if cache_path:
+                self._store_cached_story(cache_path, story)
             return story
 
         except Exception as e:
@@ -1820,9 +2333,8 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
                   self._update_progress(self.total_steps - self.current_step)
              return None
 
-    def save_as_text_file(self, content: str, title: str, language: str, output_path: Optional[str] = None) -> str:
-        """Saves the content as a text file. (Kept from original CLI script)"""
-        lang_conf = self._get_lang_config(language)
+    def _resolve_story_filename(self, title: str, language: str, output_path: Optional[str] = None) -> str:
+        """Determines the story file path (creating directories as needed) for save_as_text_file/generate_to_file."""
         safe_title = self._safe_filename(title)
         filename = ""
         output_dir_final = output_path if output_path else self.output_dir # Use provided path or instance default
@@ -1850,22 +2362,99 @@ Concisely update the "Previous Plot Summary" by adding the **most important new
         else:
             # Default: save in the current directory (should usually be covered by output_dir)
             filename = base_filename
+        return filename
+
+    def save_as_text_file(self, content: str, title: str, language: str, output_path: Optional[str] = None) -> str:
+        """Saves the content as a text file. (Kept from original CLI script)"""
+        lang_conf = self._get_lang_config(language)
+        filename = self._resolve_story_filename(title, language, output_path)
 
         # Format content (ensure H1 title is at the start) - relies on content already being formatted correctly by generate methods
         # formatted_content = self._format_story(content, title, language) # Formatting should be done, just ensure clean ending
         formatted_content = content.strip() + "\n" # Ensure single newline at end
 
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(formatted_content)
+            self._atomic_write(filename, formatted_content, durable=True)
             log.info(lang_conf["INFO_SAVED_TEXT_FILE"].format(dateiname=filename)) # 'dateiname' key
             return filename # Return the actual saved path
         except Exception as e:
              log.error(f"Error saving text file '{filename}': {str(e)}")
              raise # Re-raise the exception to signal failure
 
+    def generate_to_file(self, prompt: str, setting: str, titel: str,
+                         word_count: int = DEFAULT_TARGET_WORDS,
+                         sprache: str = "Deutsch",
+                         additional_instructions: Optional[str] = None,
+                         chapter_mode: bool = True,
+                         max_words_per_chapter: int = MAX_WORDS_PER_CHAPTER,
+                         output_path: Optional[str] = None
+                         ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Like generate(), but writes each chapter to the story file as soon as it is finished
+        (the epilogue and final ending cleanup are written at the end).
+        Returns (story, filename). story is None on failure; filename is None if nothing was saved.
+        Raises OSError if the story file cannot be created.
+        """
+        lang_conf = self._get_lang_config(sprache)
+        filename = self._resolve_story_filename(titel, sprache, output_path)
+        f = open(filename, 'w', encoding='utf-8', buffering=1 << 16) # OSError here: caller may fall back to generate()
+        written_parts: List[str] = []
+        stream_ok = True
+        story = None
+
+        def write_chapter(chapter_text: str) -> None:
+            nonlocal stream_ok
+            if not stream_ok: return
+            part = ("\n\n" if written_parts else "") + chapter_text.strip() # Same separator as _join_chapters
+            try:
+                f.write(part)
+                f.flush() # Make finished chapters visible on disk right away
+                written_parts.append(part)
+            except OSError as e:
+                # Keep generating; the full story is written (or returned) at the end
+                log.error(f"Error writing chapter to '{filename}': {e}")
+                stream_ok = False
+
+        try:
+            story = self.generate(prompt, setting, titel, word_count, sprache, additional_instructions,
+                                  chapter_mode, max_words_per_chapter, chapter_callback=write_chapter)
+            if story is not None:
+                final_content = story.strip() + "\n" # Ensure single newline at end
+                written = "".join(written_parts)
+                if stream_ok and final_content.startswith(written):
+                    f.write(final_content[len(written):]) # Epilogue, notices, trailing newline
+                else:
+                    # Final ending cleanup changed already written text (or streaming failed): rewrite the file
+                    f.seek(0)
+                    f.truncate()
+                    f.write(final_content)
+                f.flush()
+                os.fsync(f.fileno()) # Final story must be durable on disk before reporting success
+                f.close()
+        except OSError as e:
+            log.error(f"Error saving text file '{filename}': {str(e)}")
+            return story, None # Story is still available in memory
+        finally:
+            if not f.closed:
+                try: f.close()
+                except OSError: pass
+
+        if story is None:
+            # Do not leave a partial story file behind (matches generate() + save_as_text_file behaviour)
+            try: os.remove(filename)
+            except OSError as e: log.warning(f"Could not remove incomplete story file '{filename}': {e}")
+            return None, None
+
+        log.info(lang_conf["INFO_SAVED_TEXT_FILE"].format(dateiname=filename)) # 'dateiname' key
+        return story, filename
+
 
 # === Main Part / Command Line Interface (Adapted) ===
+def _print_stream_preview(label: str, delta: str) -> None:
+    """text_callback for --stream-preview: echoes the streamed text to stderr (stdout keeps the progress bar/story)."""
+    sys.stderr.write(delta if delta else f"\n--- {label} ---\n") # Empty delta: (re)start of label
+    sys.stderr.flush()
+
 def main():
     parser = argparse.ArgumentParser(
         description="Generates short stories using LLMs with enhanced quality control and chapter handling.",
@@ -1881,6 +2470,8 @@ def main():
     parser.add_argument("--additional", type=str, help="Additional instructions for the generation (e.g., style, character notes)") # Kept original name
     parser.add_argument("--api-key", type=str, help="Nebius API Key (alternatively use NEBIUS_API_KEY env var)")
     parser.add_argument("--model", type=str, default=MODELL_NAME, help="Name of the LLM model to use")
+    parser.add_argument("--summary-model", type=str, default=None,
+                        help=f"LLM model for the chapter summaries (default: same as --model; a smaller, faster model such as {SUMMARY_MODELL_NAME} cuts the time per chapter)")
     parser.add_argument("--save-text", action="store_true", help="Save the generated story as a text file")
     parser.add_argument("--output-dir", type=str, default=".",
                         help="Directory for output files (story text, outline). Can also be a full path ending in .txt for the story file.")
@@ -1888,7 +2479,18 @@ def main():
                         help="Target maximum word count per chapter generation call (influences chapter mode trigger)")
     parser.add_argument("--no-chapter-mode", action="store_true", # Kept original name
                         help=f"Force single-segment generation (only feasible for word counts < ~{int(MAX_TOKENS_PER_CALL / TOKEN_WORD_RATIO)} words)")
-    parser.add_argument("--debug", action="store_true", help="Enable detailed debug logging")
+    parser.add_argument("--use-cache", action="store_true",
+                        help=f"Reuse cached stories and API responses (outline, chapters, summaries) for identical requests, e.g. to resume a failed run (stored in {CACHE_DIR})")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Delete the cached stories and API responses before generating")
+    parser.add_argument("--rpm-limit", type=int, default=RPM_LIMIT,
+                        help="Client-side limit of API requests per minute (0: no limit; env STORY_GEN_RPM_LIMIT)")
+    parser.add_argument("--tpm-limit", type=int, default=TPM_LIMIT,
+                        help="Client-side limit of API tokens per minute (0: no limit; env STORY_GEN_TPM_LIMIT)")
+    parser.add_argument("--stream-preview", action="store_true",
+                        help="Echo the story text to stderr while it is generated (raw, before cleanup)")
+    parser.add_argument("--debug", "--verbose", action="store_true",
+                        help="Enable detailed debug logging (incl. a per-phase time breakdown)")
 
     args = parser.parse_args()
 
@@ -1920,15 +2522,23 @@ def main():
               sys.exit(1)
 
 
+    set_rate_limits(args.rpm_limit, args.tpm_limit)
+
+    if args.clear_cache:
+        for cache_subdir in ("stories", "responses"):
+            shutil.rmtree(os.path.join(CACHE_DIR, cache_subdir), ignore_errors=True)
+        log.info(f"Story cache cleared: {CACHE_DIR}")
+
     # --- Instantiate Generator and Run ---
     generator = None # Initialize generator to None
     try:
         # Pass output_dir to generator for potential use (like saving outline)
-        generator = StoryGenerator(api_key=args.api_key, model=args.model, output_dir=args.output_dir)
+        generator = StoryGenerator(api_key=args.api_key, model=args.model, output_dir=args.output_dir,
+                                   use_cache=args.use_cache, summary_model=args.summary_model,
+                                   text_callback=_print_stream_preview if args.stream_preview else None)
         lang_conf = generator._get_lang_config(args.language) # Use method after init
 
-        # Generate the story using the main generate method
-        story = generator.generate(
+        generation_args = dict(
             prompt=args.prompt,
             setting=args.setting,
             titel=args.title,
@@ -1939,6 +2549,17 @@ def main():
             max_words_per_chapter=args.max_words_per_chapter
             # Progress bar is handled internally now via show_progress_bar
         )
+        saved_filename = None
+        if args.save_text:
+            try:
+                 # Stream chapters to the story file while they are generated
+                 story, saved_filename = generator.generate_to_file(**generation_args, output_path=args.output_dir)
+            except OSError as e:
+                 log.error(f"Could not create story file ({e}). Generating without saving.")
+                 story = generator.generate(**generation_args)
+        else:
+            # Generate the story using the main generate method
+            story = generator.generate(**generation_args)
 
         # Check if story generation was successful
         if not story:
@@ -1947,15 +2568,8 @@ def main():
 
         # --- Output / Save ---
         if args.save_text:
-            try:
-                 # Use the save_as_text_file method, passing the output_dir argument
-                 generator.save_as_text_file(
-                     content=story, title=args.title, language=args.language,
-                     output_path=args.output_dir # Pass the arg directly
-                 )
-            except Exception as e:
-                 log.error(f"Could not save story to text file: {e}", exc_info=True)
-                 # Fallback: Print to console if saving fails
+            if not saved_filename:
+                 # Fallback: Print to console if saving failed
                  print("\n--- Story (Could not be saved to file) ---")
                  print(story)
                  print("--- End Story ---")